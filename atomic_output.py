@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+现代文件转换器 - 原子输出模块
+
+Copyright 2024 现代文件转换器项目
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import glob
+import os
+import uuid
+from contextlib import contextmanager
+
+
+# 临时输出文件名中的标记：.<原文件名>.<随机串>.partial<扩展名>
+PARTIAL_MARKER = '.partial'
+
+# 随机串的长度（十六进制字符）
+_TOKEN_LENGTH = 12
+
+
+def temp_output_path(output_path: str) -> str:
+    """
+    与输出文件同目录的临时文件名，保留扩展名（PIL、pandas 等按扩展名选择写出格式）
+    """
+    directory, name = os.path.split(output_path)
+    stem, ext = os.path.splitext(name)
+    return os.path.join(directory, f'.{stem}.{uuid.uuid4().hex[:_TOKEN_LENGTH]}{PARTIAL_MARKER}{ext}')
+
+
+def _fsync_path(path: str):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def commit_output(temp_path: str, output_path: str, fsync: bool = False):
+    """
+    把写完的临时文件重命名为最终输出
+
+    fsync 为 True 时先把文件内容落盘，重命名后再同步目录，断电后也不会出现截断的输出
+    """
+    if fsync:
+        _fsync_path(temp_path)
+    os.replace(temp_path, output_path)
+    if fsync and os.name == 'posix':
+        _fsync_path(os.path.dirname(os.path.abspath(output_path)))
+
+
+def discard_output(temp_path: str):
+    """
+    删除未完成的临时文件
+    """
+    try:
+        os.remove(temp_path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        print(f"删除临时输出失败: {e}")
+
+
+def remove_stale_partials(output_path: str) -> int:
+    """
+    删除某个输出遗留的临时文件（写出进程被强制终止时留下），返回删除的个数
+
+    只匹配 temp_output_path 生成的确切形式（随机串为固定长度的十六进制），
+    不会误删名称以相同前缀开头的其他输出（如 a.b.pdf 之于 a.pdf）的临时文件
+    """
+    directory, name = os.path.split(output_path)
+    stem, ext = os.path.splitext(name)
+    token = '[0-9a-f]' * _TOKEN_LENGTH
+    pattern = os.path.join(glob.escape(directory),
+                           f'.{glob.escape(stem)}.{token}{glob.escape(PARTIAL_MARKER + ext)}')
+    removed = 0
+    for path in glob.glob(pattern):
+        discard_output(path)
+        removed += 1
+    return removed
+
+
+@contextmanager
+def atomic_output(output_path: str, fsync: bool = False):
+    """
+    以原子方式写出文件：在 with 块中写入返回的临时路径，正常结束后重命名为 output_path，
+    出现异常时删除临时文件，output_path 保持原样
+    """
+    temp_path = temp_output_path(output_path)
+    try:
+        yield temp_path
+    except BaseException:
+        discard_output(temp_path)
+        raise
+    commit_output(temp_path, output_path, fsync)
@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+现代文件转换器 - 批量转换调度模块
+
+Copyright 2024 现代文件转换器项目
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import json
+import os
+import re
+import time
+import zipfile
+from concurrent.futures import as_completed
+from typing import Callable, List, Optional, Tuple
+
+
+from file_converter import ConversionResult, FileConverter
+from format_sniff import sniff_format
+from worker_pool import JobLimits, WarmWorkerPool
+
+
+# 每个工作进程的基础内存（已导入 pandas、reportlab 等库，MB）
+WORKER_BASE_MB = 150
+
+# 无法估算时使用的默认成本和内存
+DEFAULT_COST = 1.0
+DEFAULT_MEMORY_MB = 100
+
+# 预估成本系数（相对单位，约等于秒）
+COST_PER_MEGAPIXEL = 0.05
+COST_PER_PDF_PAGE = {'MD': 0.02, 'DOCX': 0.03}
+COST_PER_DOCX_MB = 2.0
+COST_PER_CSV_MB = 0.5
+COST_PER_CELL = 2e-5
+
+# 批量任务日志的默认文件名（位于输出目录）
+DEFAULT_JOURNAL_NAME = '.ftr-batch-journal.jsonl'
+
+# xlsx 工作表开头的 <dimension ref="A1:K5000"/>
+_DIMENSION_RE = re.compile(rb'<dimension[^>]*\sref="([A-Z]+)(\d+)(?::([A-Z]+)(\d+))?"')
+
+# 读取工作表开头的字节数（dimension 元素总在 sheetData 之前）
+_SHEET_HEAD_BYTES = 4096
+
+
+class JobEstimate:
+    """
+    单个转换任务的预估
+
+    cost 为相对成本（约等于秒），用于排序；memory_mb 为工作进程执行该任务时预计新增的内存
+    """
+
+    def __init__(self, source_path: str, output_path: str, target_format: str,
+                 kind: str, cost: float, memory_mb: float, detail: str = ''):
+        self.source_path = source_path
+        self.output_path = output_path
+        self.target_format = target_format
+        self.kind = kind
+        self.cost = cost
+        self.memory_mb = memory_mb
+        self.detail = detail
+
+    @property
+    def job(self) -> Tuple[str, str, str]:
+        return self.source_path, self.output_path, self.target_format
+
+    def __repr__(self):
+        return (f"JobEstimate({self.source_path!r}, kind={self.kind!r}, cost={self.cost:.2f}, "
+                f"memory_mb={self.memory_mb:.0f}, detail={self.detail!r})")
+
+
+def _column_number(letters: bytes) -> int:
+    number = 0
+    for letter in letters:
+        number = number * 26 + letter - ord('A') + 1
+    return number
+
+
+def _xlsx_cells(source_path: str) -> Tuple[int, str]:
+    """
+    从各工作表开头的 dimension 元素读取单元格数，只解压每个工作表的前几KB
+
+    没有 dimension 元素的工作表按解压后大小粗略估计（约 20 字节一个单元格）
+    """
+    cells = 0
+    sheets = 0
+    with zipfile.ZipFile(source_path) as package:
+        for info in package.infolist():
+            if not (info.filename.startswith('xl/worksheets/') and info.filename.endswith('.xml')):
+                continue
+            sheets += 1
+            with package.open(info) as sheet:
+                match = _DIMENSION_RE.search(sheet.read(_SHEET_HEAD_BYTES))
+            if match and match.group(3):
+                columns = _column_number(match.group(3)) - _column_number(match.group(1)) + 1
+                rows = int(match.group(4)) - int(match.group(2)) + 1
+                cells += max(1, columns) * max(1, rows)
+            else:
+                cells += info.file_size // 20
+    return cells, f'{sheets} 个工作表, 约 {cells} 个单元格'
+
+
+def _docx_size(source_path: str) -> Tuple[int, int]:
+    """
+    从 zip 目录读取正文和图片的解压后大小，不解压内容
+    """
+    body = media = 0
+    with zipfile.ZipFile(source_path) as package:
+        for info in package.infolist():
+            if info.filename.startswith('word/media/'):
+                media += info.file_size
+            elif info.filename.endswith('.xml'):
+                body += info.file_size
+    return body, media
+
+
+def estimate_job(source_path: str, output_path: str, target_format: str) -> JobEstimate:
+    """
+    预估单个任务的成本和内存，只读取文件头和目录信息
+
+    格式按文件内容识别。图像读取尺寸（惰性打开，不解码像素），PDF 读取页数，DOCX/XLSX
+    读取 zip 目录和工作表的 dimension，CSV/XLS 按文件大小。无法读取时返回默认估计，实际转换时再报告错误。
+    """
+    target = target_format.upper()
+    size_mb = os.path.getsize(source_path) / (1024 * 1024) if os.path.exists(source_path) else 0
+
+    def estimate(kind, cost, memory_mb, detail=''):
+        return JobEstimate(source_path, output_path, target_format, kind, cost, memory_mb, detail)
+
+    try:
+        ext = sniff_format(source_path)
+        if ext in ('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.webp'):
+            # 与转换时相同，超大图像不触发 Pillow 的解压炸弹检查，否则会被当作默认成本排到最后
+            with FileConverter._open_image(source_path) as img:
+                width, height = img.size
+                frames = getattr(img, 'n_frames', 1)
+            megapixels = width * height / 1e6
+            # 解码后的 RGBA 像素和转换后的副本
+            return estimate('image', COST_PER_MEGAPIXEL * megapixels * frames + 0.02,
+                            megapixels * 8 + 20, f'{width}x{height}, {frames} 帧')
+        if ext == '.pdf':
+            import PyPDF2
+            with open(source_path, 'rb') as file:
+                pages = len(PyPDF2.PdfReader(file, strict=False).pages)
+            cost = COST_PER_PDF_PAGE.get(target, COST_PER_PDF_PAGE['DOCX']) * pages
+            return estimate('pdf', cost + 0.05, 50 + size_mb * 1.5, f'{pages} 页')
+        if ext == '.docx':
+            body, media = _docx_size(source_path)
+            body_mb, media_mb = body / (1024 * 1024), media / (1024 * 1024)
+            return estimate('docx', COST_PER_DOCX_MB * body_mb + 0.1 * media_mb + 0.05,
+                            50 + body_mb * 20 + media_mb * 4, f'正文 {body_mb:.1f} MB, 图片 {media_mb:.1f} MB')
+        if ext == '.xlsx':
+            cells, detail = _xlsx_cells(source_path)
+            return estimate('xlsx', COST_PER_CELL * cells + 0.05, 50 + cells * 200 / (1024 * 1024), detail)
+        if ext in ('.csv', '.xls'):
+            factor = 1 if ext == '.csv' else 4
+            return estimate(ext[1:], COST_PER_CSV_MB * size_mb * factor + 0.02,
+                            50 + size_mb * 5 * factor, f'{size_mb:.1f} MB')
+    except Exception as e:
+        return estimate('unknown', DEFAULT_COST, DEFAULT_MEMORY_MB, f'无法预估: {e}')
+    return estimate('unknown', DEFAULT_COST, DEFAULT_MEMORY_MB)
+
+
+def available_memory_mb() -> Optional[float]:
+    """
+    系统可用内存（MB），无法获取时返回 None
+    """
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError):
+        pass
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def plan_batch(estimates: List[JobEstimate], memory_budget_mb: Optional[float] = None,
+               max_workers: Optional[int] = None) -> Tuple[List[JobEstimate], int]:
+    """
+    按成本从大到小排序（最长任务优先），并按内存预算确定工作进程数
+
+    最大的任务最先同时运行，因此取最大的 N 个任务：N 个工作进程的基础内存加上
+    这些任务的预估内存不超过预算时，N 即为可用的工作进程数（至少 1 个）。
+    """
+    ordered = sorted(estimates, key=lambda item: item.cost, reverse=True)
+    workers = max(1, min(max_workers or os.cpu_count() or 1, len(ordered) or 1))
+    if memory_budget_mb:
+        by_memory = sorted((item.memory_mb for item in ordered), reverse=True)
+        fit = 0
+        total = 0.0
+        for memory_mb in by_memory[:workers]:
+            total += WORKER_BASE_MB + memory_mb
+            if total > memory_budget_mb:
+                break
+            fit += 1
+        workers = max(1, fit)
+    return ordered, workers
+
+
+class BatchJournal:
+    """
+    批量转换日志（JSON Lines，只追加）
+
+    每个任务结束后追加一行：源文件、输出、格式、源文件的大小和修改时间、状态。
+    输出在重命名为最终文件名之后才记入日志，日志中成功的任务其输出一定完整；
+    恢复时只比较日志与源文件的大小和修改时间，不重新转换也不重新检查输出。
+    进程中途被终止时最后一行可能不完整，读取时忽略。
+    """
+
+    def __init__(self, path: str, resume: bool = False, fsync: bool = False):
+        self.path = path
+        self.fsync = fsync
+        self._done = {}
+        if resume and os.path.exists(path):
+            self._load()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, 'a' if resume else 'w', encoding='utf-8')
+
+    @staticmethod
+    def _key(source_path: str, output_path: str, target_format: str) -> tuple:
+        return os.path.abspath(source_path), os.path.abspath(output_path), target_format.upper()
+
+    @staticmethod
+    def _signature(source_path: str) -> Optional[list]:
+        try:
+            stat = os.stat(source_path)
+        except OSError:
+            return None
+        return [stat.st_size, stat.st_mtime_ns]
+
+    def _load(self):
+        with open(self.path, encoding='utf-8') as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                    key = self._key(record['source'], record['output'], record['format'])
+                except (ValueError, KeyError, TypeError):
+                    continue
+                if record.get('status') == 'ok':
+                    self._done[key] = record.get('source_stat')
+                else:
+                    self._done.pop(key, None)
+
+    def is_done(self, source_path: str, output_path: str, target_format: str) -> bool:
+        """
+        该任务是否已在之前的运行中成功完成，且源文件未被修改
+        """
+        signature = self._done.get(self._key(source_path, output_path, target_format))
+        return signature is not None and signature == self._signature(source_path)
+
+    def record(self, source_path: str, output_path: str, target_format: str, result: ConversionResult):
+        entry = {
+            'source': os.path.abspath(source_path),
+            'output': os.path.abspath(output_path),
+            'format': target_format.upper(),
+            'source_stat': self._signature(source_path),
+            'status': result.status,
+            'output_size': result.output_size,
+            'time': round(time.time(), 3),
+        }
+        self._file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def run_batch(jobs: List[Tuple[str, str, str]], memory_budget_mb: Optional[float] = None,
+              max_workers: Optional[int] = None, options: Optional[dict] = None,
+              limits: Optional[JobLimits] = None,
+              on_result: Optional[Callable] = None,
+              journal: Optional[BatchJournal] = None) -> list:
+    """
+    批量转换：预估每个任务，最长任务优先地提交到预热工作进程池
+
+    jobs 为 (源路径, 输出路径, 目标格式) 列表；memory_budget_mb 为整个批次的内存预算，
+    未指定时使用系统可用内存。on_result(estimate, result) 在每个任务完成时调用。
+    指定 journal 时每个任务结束后写入日志，日志中已完成的任务直接跳过（status 为 'skipped'）。
+    返回与 jobs 顺序一致的 ConversionResult 列表
+    """
+    results = [None] * len(jobs)
+    pending = []
+    for index, job in enumerate(jobs):
+        if journal is not None and journal.is_done(*job):
+            results[index] = ConversionResult(True, job[1], 'skipped')
+        else:
+            pending.append(index)
+    if not pending:
+        return results
+
+    estimates = {index: estimate_job(*jobs[index]) for index in pending}
+    ordered, workers = plan_batch(list(estimates.values()), memory_budget_mb or available_memory_mb(),
+                                  max_workers)
+    index_of = {id(item): index for index, item in estimates.items()}
+
+    pool = WarmWorkerPool(workers)
+    try:
+        futures = {pool.submit_conversion(item.source_path, item.output_path, item.target_format,
+                                          options, limits): item
+                   for item in ordered}
+        for future in as_completed(futures):
+            item = futures[future]
+            result = future.result()
+            results[index_of[id(item)]] = result
+            if journal is not None:
+                journal.record(*item.job, result)
+            if on_result is not None:
+                on_result(item, result)
+    finally:
+        pool.shutdown(cancel_futures=True)
+    return results
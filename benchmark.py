@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+现代文件转换器 - 性能基准测试
+
+用法:
+    python benchmark.py render-context [--runs N]
+    python benchmark.py extractors 样本.pdf [样本.pdf ...] [--pages N]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import file_converter
+from file_converter import FileConverter
+from pdf_text import EXTRACTORS, PDF_EXTRACTOR_ENV, benchmark_extractors
+
+
+def _make_small_inputs(work_dir: str) -> dict:
+    """
+    生成只有几行内容的 DOCX 和 CSV，使转换耗时以固定开销为主
+    """
+    from docx import Document
+
+    docx_path = os.path.join(work_dir, 'small.docx')
+    doc = Document()
+    doc.add_paragraph('Benchmark paragraph')
+    table = doc.add_table(rows=2, cols=2)
+    table.cell(0, 0).text = 'a'
+    table.cell(1, 1).text = 'b'
+    doc.save(docx_path)
+
+    csv_path = os.path.join(work_dir, 'small.csv')
+    with open(csv_path, 'w', encoding='utf-8') as f:
+        f.write('name,value\nx,1\ny,2\n')
+
+    return {'DOCX': docx_path, 'CSV': csv_path}
+
+
+def _time_conversions(converter: FileConverter, source_path: str, output_path: str,
+                      runs: int, cold: bool) -> float:
+    """
+    返回每个文档的平均耗时（毫秒）；cold 为 True 时每次转换前丢弃渲染上下文
+    """
+    total = 0.0
+    for _ in range(runs):
+        if cold:
+            file_converter.reset_render_context()
+        start = time.perf_counter()
+        if not converter.convert(source_path, output_path, 'PDF'):
+            raise RuntimeError(f"转换失败: {source_path}")
+        total += time.perf_counter() - start
+    return total / runs * 1000
+
+
+def bench_render_context(runs: int):
+    """
+    对比每次重建样式（旧行为）与复用进程级渲染上下文的单文档固定开销
+    """
+    converter = FileConverter()
+
+    start = time.perf_counter()
+    for _ in range(runs):
+        file_converter.RenderContext()
+    build_ms = (time.perf_counter() - start) / runs * 1000
+    print(f"构建渲染上下文: {build_ms:.3f} ms/次")
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        inputs = _make_small_inputs(work_dir)
+        output_path = os.path.join(work_dir, 'out.pdf')
+        # 预热：首次导入和字体加载不计入
+        for source_path in inputs.values():
+            converter.convert(source_path, output_path, 'PDF')
+
+        print(f"{'输入':<6}{'每次重建 (ms)':>16}{'复用上下文 (ms)':>18}{'节省':>10}")
+        for name, source_path in inputs.items():
+            cold = _time_conversions(converter, source_path, output_path, runs, cold=True)
+            warm = _time_conversions(converter, source_path, output_path, runs, cold=False)
+            saved = (cold - warm) / cold * 100 if cold else 0.0
+            print(f"{name:<6}{cold:>16.3f}{warm:>18.3f}{saved:>9.1f}%")
+
+
+def bench_extractors(sample_paths: list, max_pages: int):
+    """
+    在样本PDF上对比已安装的文本提取后端，并给出最快的后端
+    """
+    results = benchmark_extractors(sample_paths, max_pages)
+    missing = [name for name in EXTRACTORS if name not in {r[0] for r in results}]
+    
+    print(f"{'后端':<10}{'每页 (ms)':>12}  状态")
+    for name, per_page, error in results:
+        status = f"错误: {error}" if error else "正常"
+        print(f"{name:<10}{per_page:>12.2f}  {status}")
+    for name in missing:
+        print(f"{name:<10}{'-':>12}  未安装")
+        
+    fastest = next((name for name, _, error in results if error is None), None)
+    if fastest:
+        print(f"最快的后端: {fastest}（设置 {PDF_EXTRACTOR_ENV}={fastest} 或 FileConverter(text_extractor='{fastest}')）")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='文件转换工具 - 性能基准测试')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    render = subparsers.add_parser('render-context', help='渲染上下文复用前后的单文档固定开销')
+    render.add_argument('--runs', type=int, default=200, help='每种情况的转换次数')
+
+    extractors = subparsers.add_parser('extractors', help='对比PDF文本提取后端的速度')
+    extractors.add_argument('samples', nargs='+', help='样本PDF文件')
+    extractors.add_argument('--pages', type=int, default=20, help='每个样本最多提取的页数')
+    
+    args = parser.parse_args()
+    if args.command == 'render-context':
+        bench_render_context(args.runs)
+    elif args.command == 'extractors':
+        bench_extractors(args.samples, args.pages)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
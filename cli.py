@@ -6,14 +6,220 @@
 import os
 import sys
 import argparse
-from file_converter import FileConverter
+from file_converter import FileConverter, PdfOptions
+
+
+def merge_main(argv):
+    """
+    cli.py merge 输出.pdf 输入1.pdf 输入2.pdf ...
+    """
+    parser = argparse.ArgumentParser(prog='cli.py merge', description='按顺序合并多个PDF')
+    parser.add_argument('output', help='输出PDF路径')
+    parser.add_argument('sources', nargs='+', help='要合并的PDF文件')
+    args = parser.parse_args(argv)
+    
+    converter = FileConverter()
+    print(f"开始合并 {len(args.sources)} 个PDF -> {args.output}")
+    result = converter.merge_pdfs(args.sources, args.output)
+    if result:
+        print("✅ 合并成功!")
+        print(f"输出大小: {result.output_size / 1024:.1f} KB")
+    else:
+        print("❌ 合并失败!")
+        sys.exit(1)
+
+
+def serve_main(argv):
+    """
+    cli.py serve [--host H] [--port P] [--workers N] [--queue N] [--max-uploads N]
+                 [--output-root DIR] [--allow-host NAME]
+    """
+    from server import (DEFAULT_HOST, DEFAULT_MAX_UPLOAD_MB, DEFAULT_MAX_UPLOADS, DEFAULT_PORT,
+                        DEFAULT_QUEUE_SIZE, serve)
+    from worker_pool import DEFAULT_MAX_JOBS_PER_WORKER, DEFAULT_MAX_WORKER_RSS_MB, JobLimits
+    
+    parser = argparse.ArgumentParser(prog='cli.py serve', description='启动本地HTTP转换服务')
+    parser.add_argument('--host', default=DEFAULT_HOST, help='监听地址')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='监听端口')
+    parser.add_argument('--workers', type=int, default=None, help='工作进程数，默认等于CPU核数')
+    parser.add_argument('--queue', type=int, default=DEFAULT_QUEUE_SIZE,
+                        help='等待队列长度，队列满时返回 429')
+    parser.add_argument('--max-upload', type=int, default=DEFAULT_MAX_UPLOAD_MB, metavar='MB',
+                        help='上传文件大小上限 (MB)')
+    parser.add_argument('--max-uploads', type=int, default=DEFAULT_MAX_UPLOADS, metavar='N',
+                        help='同时接收的上传数上限，超出时返回 429')
+    parser.add_argument('--output-root', default=None, metavar='DIR',
+                        help='本机文件转换的输出目录，输出只能写在其中（默认当前目录）')
+    parser.add_argument('--allow-host', action='append', default=[], metavar='NAME',
+                        help='除本机地址外允许的 Host 名称（可重复，监听非本机地址时使用）')
+    parser.add_argument('--max-jobs-per-worker', type=int, default=DEFAULT_MAX_JOBS_PER_WORKER, metavar='N',
+                        help='工作进程处理 N 个任务后回收')
+    parser.add_argument('--max-worker-rss', type=int, default=DEFAULT_MAX_WORKER_RSS_MB, metavar='MB',
+                        help='工作进程常驻内存超过该值后回收 (0 表示不限制)')
+    parser.add_argument('--job-timeout', type=float, default=None, metavar='SEC',
+                        help='单个任务的墙钟时间上限，超出时终止并替换工作进程')
+    parser.add_argument('--job-cpu', type=float, default=None, metavar='SEC',
+                        help='单个任务的CPU时间上限')
+    parser.add_argument('--job-memory', type=int, default=None, metavar='MB',
+                        help='单个任务允许新增的内存上限')
+    args = parser.parse_args(argv)
+    
+    serve(args.host, args.port, args.workers, args.queue, args.max_upload,
+          args.max_jobs_per_worker, args.max_worker_rss or None,
+          JobLimits(args.job_timeout, args.job_cpu, args.job_memory), args.max_uploads,
+          args.output_root, args.allow_host)
+
+
+def batch_main(argv):
+    """
+    cli.py batch 格式 源文件... [-o 输出目录] [--workers N] [--total-memory MB] [--resume]
+    """
+    import time
+    from batch import (DEFAULT_JOURNAL_NAME, BatchJournal, available_memory_mb, estimate_job,
+                       plan_batch, run_batch)
+    from worker_pool import JobLimits
+    
+    parser = argparse.ArgumentParser(prog='cli.py batch', description='批量转换，最长任务优先调度')
+    parser.add_argument('format', help='目标格式')
+    parser.add_argument('sources', nargs='+', help='源文件')
+    parser.add_argument('-o', '--output-dir', default=None, help='输出目录，默认与源文件相同')
+    parser.add_argument('--workers', type=int, default=None, help='工作进程数上限，默认等于CPU核数')
+    parser.add_argument('--total-memory', type=int, default=None, metavar='MB',
+                        help='整个批次的内存预算，决定同时运行的工作进程数，默认为系统可用内存')
+    parser.add_argument('--job-timeout', type=float, default=None, metavar='SEC',
+                        help='单个任务的墙钟时间上限')
+    parser.add_argument('--job-memory', type=int, default=None, metavar='MB',
+                        help='单个任务允许新增的内存上限')
+    parser.add_argument('--dry-run', action='store_true', help='只显示预估和执行顺序，不转换')
+    parser.add_argument('--journal', default=None, metavar='FILE',
+                        help=f'任务日志路径，默认为输出目录（或当前目录）下的 {DEFAULT_JOURNAL_NAME}')
+    parser.add_argument('--resume', action='store_true', help='跳过日志中已完成且源文件未改动的任务')
+    parser.add_argument('--fsync', action='store_true', help='输出和日志写入后落盘（防止断电丢失）')
+    args = parser.parse_args(argv)
+    
+    jobs = []
+    for source in args.sources:
+        if not os.path.exists(source):
+            print(f"错误: 源文件不存在: {source}")
+            sys.exit(1)
+        base = os.path.splitext(os.path.basename(source))[0]
+        output_dir = args.output_dir or os.path.dirname(source)
+        jobs.append((source, os.path.join(output_dir, f'{base}.{args.format.lower()}'), args.format))
+    
+    budget = args.total_memory or available_memory_mb()
+    if args.dry_run:
+        ordered, workers = plan_batch([estimate_job(*job) for job in jobs], budget, args.workers)
+        print(f"工作进程: {workers}")
+        for item in ordered:
+            print(f"  {item.cost:8.2f}  {item.memory_mb:7.0f} MB  {item.source_path} ({item.detail})")
+        return
+    
+    start = time.perf_counter()
+    done = [0]
+    total = [len(jobs)]
+    
+    def on_result(item, result):
+        done[0] += 1
+        mark = '✅' if result else f'❌ ({result.status})'
+        print(f"[{done[0]}/{total[0]}] {mark} {item.source_path} -> {item.output_path}")
+    
+    journal_path = args.journal or os.path.join(args.output_dir or '.', DEFAULT_JOURNAL_NAME)
+    with BatchJournal(journal_path, resume=args.resume, fsync=args.fsync) as journal:
+        # 进度中的总数不含日志中已完成、将被跳过的任务
+        total[0] = sum(1 for job in jobs if not journal.is_done(*job))
+        results = run_batch(jobs, budget, args.workers, options={'fsync': args.fsync},
+                            limits=JobLimits(args.job_timeout, None, args.job_memory),
+                            on_result=on_result, journal=journal)
+    failed = sum(1 for result in results if not result)
+    skipped = sum(1 for result in results if result.status == 'skipped')
+    if skipped:
+        print(f"跳过 {skipped} 个已完成的任务")
+    print(f"完成 {len(results) - failed}/{len(results)}，用时 {time.perf_counter() - start:.1f} 秒")
+    if failed:
+        sys.exit(1)
+
+
+def sync_main(argv):
+    """
+    cli.py sync 源目录 目标目录 --map pdf:md,xlsx:csv
+    """
+    import time
+    from batch import available_memory_mb
+    from dir_sync import parse_format_map, sync_directories
+    from worker_pool import JobLimits
+    
+    parser = argparse.ArgumentParser(prog='cli.py sync', description='把源目录增量转换到目标目录')
+    parser.add_argument('src_dir', help='源目录')
+    parser.add_argument('dst_dir', help='目标目录')
+    parser.add_argument('--map', required=True, dest='format_map', metavar='EXT:FMT,...',
+                        help='按扩展名指定目标格式，如 pdf:md,xlsx:csv')
+    parser.add_argument('--workers', type=int, default=None, help='工作进程数上限，默认等于CPU核数')
+    parser.add_argument('--total-memory', type=int, default=None, metavar='MB',
+                        help='内存预算，决定同时运行的工作进程数，默认为系统可用内存')
+    parser.add_argument('--job-timeout', type=float, default=None, metavar='SEC',
+                        help='单个任务的墙钟时间上限')
+    parser.add_argument('--no-delete', action='store_true', help='源文件已删除时保留其输出')
+    parser.add_argument('--dry-run', action='store_true', help='只列出需要转换的文件')
+    args = parser.parse_args(argv)
+    
+    if not os.path.isdir(args.src_dir):
+        print(f"错误: 源目录不存在: {args.src_dir}")
+        sys.exit(1)
+    try:
+        format_map = parse_format_map(args.format_map)
+    except ValueError as e:
+        print(f"错误: {e}")
+        sys.exit(1)
+    
+    start = time.perf_counter()
+    
+    def on_result(item, result):
+        mark = '✅' if result else f'❌ ({result.status})'
+        print(f"{mark} {item.source_path} -> {item.output_path}")
+    
+    report = sync_directories(args.src_dir, args.dst_dir, format_map,
+                              delete=not args.no_delete, dry_run=args.dry_run,
+                              memory_budget_mb=args.total_memory or available_memory_mb(),
+                              max_workers=args.workers, limits=JobLimits(args.job_timeout),
+                              on_result=on_result)
+    print(f"新增 {report.added}，更新 {report.updated}，未变 {report.unchanged}，"
+          f"删除 {report.deleted}，失败 {report.failed}，用时 {time.perf_counter() - start:.1f} 秒")
+    if report.failed:
+        sys.exit(1)
+
+
+SUBCOMMANDS = {
+    'merge': merge_main,
+    'serve': serve_main,
+    'batch': batch_main,
+    'sync': sync_main,
+}
 
 
 def main():
-    parser = argparse.ArgumentParser(description='文件转换工具 - 命令行版本')
+    # 子命令；其余情况保持原有的 "源文件 输出文件 格式" 用法
+    if len(sys.argv) > 1 and sys.argv[1] in SUBCOMMANDS:
+        return SUBCOMMANDS[sys.argv[1]](sys.argv[2:])
+        
+    parser = argparse.ArgumentParser(description='文件转换工具 - 命令行版本',
+                                     epilog='合并PDF: cli.py merge 输出.pdf 输入.pdf ...\n'
+                                            '转换服务: cli.py serve [--port P]\n'
+                                            '批量转换: cli.py batch 格式 源文件... [-o 输出目录] [--resume]\n'
+                                            '目录同步: cli.py sync 源目录 目标目录 --map pdf:md,xlsx:csv',
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
     parser.add_argument('source', help='源文件路径')
     parser.add_argument('output', help='输出文件路径')
     parser.add_argument('format', help='目标格式 (PDF, DOCX, JPG, PNG, GIF, BMP, CSV, XLSX)')
+    parser.add_argument('--memory-budget', type=int, default=None, metavar='MB',
+                        help='本次转换的内存预算 (MB)，超出预算的图像将在解码前被拒绝')
+    parser.add_argument('--no-compress', action='store_true',
+                        help='生成PDF时不压缩页面内容流')
+    parser.add_argument('--image-dpi', type=int, default=None, metavar='DPI',
+                        help='PDF中嵌入图像的目标分辨率，超出的图像会被降采样')
+    parser.add_argument('--jpeg-quality', type=int, default=None, metavar='Q',
+                        help='PDF中嵌入图像以JPEG重新编码时的质量 (1-95)')
+    parser.add_argument('--fsync', action='store_true',
+                        help='输出重命名前落盘（防止断电后出现截断的文件）')
     
     args = parser.parse_args()
     
@@ -23,18 +229,25 @@ def main():
         sys.exit(1)
     
     # 初始化转换器
-    converter = FileConverter()
+    converter = FileConverter(fsync_output=args.fsync)
     
     print(f"开始转换: {args.source} -> {args.output}")
     print(f"目标格式: {args.format}")
     
     # 执行转换
     try:
-        success = converter.convert(args.source, args.output, args.format)
+        pdf_options = PdfOptions(compress=not args.no_compress,
+                                 image_dpi=args.image_dpi,
+                                 jpeg_quality=args.jpeg_quality)
+        result = converter.convert(args.source, args.output, args.format,
+                                   memory_budget_mb=args.memory_budget,
+                                   pdf_options=pdf_options)
         
-        if success:
+        if result:
             print("✅ 转换成功!")
             print(f"输出文件: {args.output}")
+            if result.output_size is not None:
+                print(f"输出大小: {result.output_size / 1024:.1f} KB")
         else:
             print("❌ 转换失败!")
             sys.exit(1)
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+现代文件转换器 - 目录增量同步模块
+
+Copyright 2024 现代文件转换器项目
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import json
+import os
+import time
+from typing import Callable, Dict, Optional
+
+from atomic_output import atomic_output
+from batch import run_batch
+from text_cache import file_digest
+from worker_pool import JobLimits
+
+
+# 清单文件名（位于目标目录）
+MANIFEST_NAME = '.ftr-sync-manifest.json'
+
+_MANIFEST_VERSION = 1
+
+# 转换过程中保存清单的间隔（秒），中断后已完成的转换不必重做
+MANIFEST_SAVE_INTERVAL = 30
+
+
+def parse_format_map(spec: str) -> Dict[str, str]:
+    """
+    解析 "pdf:md,xlsx:csv" 形式的映射，返回 {'.pdf': 'MD', '.xlsx': 'CSV'}
+    """
+    mapping = {}
+    for item in spec.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        source, sep, target = item.partition(':')
+        if not sep or not source.strip() or not target.strip():
+            raise ValueError(f"格式映射无效: {item}（应为 源扩展名:目标格式）")
+        mapping['.' + source.strip().lstrip('.').lower()] = target.strip().lstrip('.').upper()
+    if not mapping:
+        raise ValueError("格式映射为空")
+    return mapping
+
+
+def _walk(root: str, skip: str):
+    """
+    递归列出 root 下的文件，产出 (相对路径, stat)；跳过 skip 目录（目标目录位于源目录中时）
+    """
+    # 相对路径逐级拼接，不对每个文件调用 os.path.relpath（文件数很多时开销明显）
+    stack = [(root, '')]
+    while stack:
+        directory, prefix = stack.pop()
+        try:
+            entries = list(os.scandir(directory))
+        except OSError as e:
+            print(f"读取目录失败: {e}")
+            continue
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if os.path.realpath(entry.path) != skip:
+                        stack.append((entry.path, prefix + entry.name + os.sep))
+                elif entry.is_file():
+                    yield prefix + entry.name, entry.stat()
+            except OSError as e:
+                print(f"读取文件失败: {e}")
+
+
+class SyncManifest:
+    """
+    同步清单：源文件相对路径 -> 大小、修改时间、内容哈希、输出相对路径和目标格式
+
+    大小和修改时间都未变的文件视为未改动，不读取内容；只有二者变化时才计算哈希，
+    内容相同（如仅被 touch）时只更新清单，不重新转换。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries = {}
+        try:
+            with open(path, encoding='utf-8') as file:
+                data = json.load(file)
+            if data.get('version') == _MANIFEST_VERSION:
+                self.entries = data.get('files', {})
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"同步清单无法读取，将全部重新转换: {e}")
+
+    def save(self):
+        # json.dumps 一次性编码（C实现），比 json.dump 逐段写出快得多
+        data = json.dumps({'version': _MANIFEST_VERSION, 'files': self.entries},
+                          ensure_ascii=False, separators=(',', ':'))
+        with atomic_output(self.path) as temp_path:
+            with open(temp_path, 'w', encoding='utf-8') as file:
+                file.write(data)
+
+
+class SyncReport:
+    def __init__(self):
+        self.added = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.deleted = 0
+        self.failed = 0
+
+    def __repr__(self):
+        return (f"SyncReport(added={self.added}, updated={self.updated}, unchanged={self.unchanged}, "
+                f"deleted={self.deleted}, failed={self.failed})")
+
+
+def _output_rel_path(rel_path: str, target_format: str) -> str:
+    return f'{os.path.splitext(rel_path)[0]}.{target_format.lower()}'
+
+
+def _remove_output(dst_dir: str, rel_output: str) -> bool:
+    """
+    删除一个输出文件，返回是否确实删除了文件
+    """
+    path = os.path.join(dst_dir, rel_output)
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        return False
+    except OSError as e:
+        print(f"删除输出失败: {e}")
+        return False
+    # 清理变空的子目录，目标目录本身保留
+    directory = os.path.dirname(path)
+    while os.path.abspath(directory) != os.path.abspath(dst_dir):
+        try:
+            os.rmdir(directory)
+        except OSError:
+            break
+        directory = os.path.dirname(directory)
+    return True
+
+
+def sync_directories(src_dir: str, dst_dir: str, format_map: Dict[str, str],
+                     delete: bool = True, dry_run: bool = False,
+                     memory_budget_mb: Optional[float] = None, max_workers: Optional[int] = None,
+                     limits: Optional[JobLimits] = None,
+                     on_result: Optional[Callable] = None) -> SyncReport:
+    """
+    把 src_dir 中按 format_map 映射的文件增量转换到 dst_dir（保持相对目录结构）
+
+    只转换新增或内容变化的文件，改动集合按最长任务优先并行转换；源文件已删除的输出
+    在 delete 为 True 时一并删除。清单保存在 dst_dir/.ftr-sync-manifest.json，
+    转换过程中每隔 MANIFEST_SAVE_INTERVAL 秒保存一次，转换失败的文件下次同步时重试。
+    """
+    report = SyncReport()
+    os.makedirs(dst_dir, exist_ok=True)
+    manifest = SyncManifest(os.path.join(dst_dir, MANIFEST_NAME))
+    previous = manifest.entries
+    current = {}
+    jobs = []
+    pending = {}
+    claimed = set()
+
+    for rel_path, stat in _walk(src_dir, os.path.realpath(dst_dir)):
+        target_format = format_map.get(os.path.splitext(rel_path)[1].lower())
+        if target_format is None:
+            continue
+        rel_output = _output_rel_path(rel_path, target_format)
+        if rel_output in claimed:
+            print(f"输出路径冲突，跳过: {rel_path} -> {rel_output}")
+            continue
+        claimed.add(rel_output)
+        entry = previous.get(rel_path)
+        output_path = os.path.join(dst_dir, rel_output)
+        same_target = (entry is not None and entry.get('output') == rel_output
+                       and entry.get('format') == target_format)
+
+        if same_target and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns \
+                and os.path.exists(output_path):
+            current[rel_path] = entry
+            report.unchanged += 1
+            continue
+
+        source_path = os.path.join(src_dir, rel_path)
+        digest = None
+        if same_target and entry['size'] == stat.st_size and os.path.exists(output_path):
+            # 修改时间变化但大小相同：比较内容哈希
+            try:
+                digest = file_digest(source_path)
+            except OSError as e:
+                print(f"读取文件失败: {e}")
+                # 保留旧的清单项，输出不会被当作已删除源文件的输出清理，下次同步时重试
+                current[rel_path] = entry
+                report.failed += 1
+                continue
+            if digest == entry.get('hash'):
+                current[rel_path] = dict(entry, mtime_ns=stat.st_mtime_ns)
+                report.unchanged += 1
+                continue
+
+        if entry is not None and entry.get('output') != rel_output:
+            # 映射改变，旧输出不再对应任何源文件
+            if not dry_run:
+                _remove_output(dst_dir, entry['output'])
+        pending[output_path] = (rel_path, rel_output, target_format, stat, digest, entry is None)
+        jobs.append((source_path, output_path, target_format))
+
+    pending_sources = {item[0] for item in pending.values()}
+    removed = {rel_path: entry for rel_path, entry in previous.items()
+               if rel_path not in current and rel_path not in pending_sources}
+    for rel_path, entry in removed.items():
+        # 输出路径已被其他源文件占用时不删除
+        if not delete or entry['output'] in claimed:
+            continue
+        if dry_run:
+            print(f"  删除: {entry['output']}")
+        elif _remove_output(dst_dir, entry['output']):
+            report.deleted += 1
+
+    if dry_run:
+        for rel_path, _, target_format, _, _, added in pending.values():
+            print(f"  {'新增' if added else '更新'}: {rel_path} -> {target_format}")
+            if added:
+                report.added += 1
+            else:
+                report.updated += 1
+        return report
+
+    # 尚未完成的改动保留旧的清单项（大小和修改时间与源文件不符，会被重新转换），
+    # 不删除模式下保留已删除源文件的清单项，以便之后改用删除模式时仍能清理其输出
+    carried = {rel_path: previous[rel_path] for rel_path, rel_output, *_ in pending.values()
+               if rel_path in previous and previous[rel_path].get('output') == rel_output}
+    if not delete:
+        carried.update(removed)
+
+    def save_manifest():
+        entries = {**carried, **current}
+        # 没有任何变化时不重写清单
+        if entries != manifest.entries:
+            manifest.entries = entries
+            manifest.save()
+
+    last_save = time.monotonic()
+
+    def record(item, result):
+        nonlocal last_save
+        rel_path, rel_output, target_format, stat, digest, added = pending[item.output_path]
+        succeeded = bool(result)
+        if succeeded and digest is None:
+            try:
+                digest = file_digest(item.source_path)
+            except OSError as e:
+                # 无法记录哈希时按失败处理，下次同步时重新转换
+                print(f"读取文件失败: {e}")
+                succeeded = False
+        if succeeded:
+            current[rel_path] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'hash': digest,
+                                 'output': rel_output, 'format': target_format}
+            if added:
+                report.added += 1
+            else:
+                report.updated += 1
+        else:
+            report.failed += 1
+            # 保留旧的清单项（其大小和修改时间与源文件不符），下次同步时重试
+            if rel_path in previous and previous[rel_path].get('output') == rel_output:
+                current[rel_path] = previous[rel_path]
+        if time.monotonic() - last_save >= MANIFEST_SAVE_INTERVAL:
+            save_manifest()
+            last_save = time.monotonic()
+        if on_result is not None:
+            on_result(item, result)
+
+    try:
+        if jobs:
+            run_batch(jobs, memory_budget_mb, max_workers, limits=limits, on_result=record)
+    finally:
+        save_manifest()
+    return report
@@ -18,78 +18,503 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 
+import asyncio
+import functools
 import os
 import shutil
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from typing import Callable, Optional, Union
 from PIL import Image
 import pandas as pd
-from docx import Document
 from docx.shared import Inches
+from docx.oxml.ns import qn
+from lxml import etree
 from reportlab.lib.pagesizes import letter
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image as RLImage
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 from reportlab.lib import colors
-import PyPDF2
+from reportlab.lib.utils import ImageReader
+from reportlab.platypus.flowables import Flowable
+from atomic_output import atomic_output, commit_output, discard_output, temp_output_path
+from docx_writer import DocxStreamWriter
+from pdf_checkpoint import CHECKPOINT_MIN_PAGES, PageCheckpoint, checkpoint_path_for, remove_checkpoint
+from pdf_merge import merge_pdfs
+from pdf_text import get_extractor, select_fastest_extractor
+from text_cache import TextCache, get_default_text_cache
+from font_manager import contains_cjk, get_cjk_font
+from format_sniff import canonical_ext, sniff_format
+import io
+import mmap
+import posixpath
 import tempfile
+import threading
+import time
+import zipfile
 import re
+from xml.sax.saxutils import escape
 
 
-class FileConverter:
+# 每个转换任务默认的内存预算（MB）
+DEFAULT_MEMORY_BUDGET_MB = 2048
+
+# 源文件超过该大小时，DOCX/表格转PDF自动使用分段渲染
+INCREMENTAL_PDF_BYTES = 16 * 1024 * 1024
+
+# PDF源文件超过该大小时，按内存映射方式读取
+MMAP_PDF_BYTES = 64 * 1024 * 1024
+
+# 提取文本时每处理多少页提交一次缓存（中断后重跑可复用已提交的页面）
+TEXT_CACHE_COMMIT_PAGES = 32
+
+# 分段渲染时每个分段PDF包含的流式对象数
+PDF_PART_FLOWABLES = 2000
+
+# 分段渲染表格时每张表格的行数和每个分段PDF的行数
+SPREADSHEET_ROWS_PER_TABLE = 200
+SPREADSHEET_ROWS_PER_PART = 20000
+
+# 分条带处理时每个条带的目标字节数
+IMAGE_STRIP_BYTES = 16 * 1024 * 1024
+
+# 图像输出的编码预设
+IMAGE_PRESETS = {
+    'default': {},
+    'web': {'quality': 85, 'optimize': True, 'progressive': True},
+    'thumbnail': {'quality': 75, 'optimize': True},
+    'archive': {'quality': 95, 'subsampling': 0},
+}
+
+# Image.MAX_IMAGE_PIXELS 是全局设置，打开图像时需要加锁临时替换
+_IMAGE_OPEN_LOCK = threading.Lock()
+
+
+class PdfOptions:
+    """
+    PDF输出选项
+
+    compress      是否压缩页面内容流
+    image_dpi     嵌入图像的目标分辨率，超出的图像按显示尺寸降采样；None 表示按 72 DPI（原有行为）
+    jpeg_quality  设置后不含透明通道的嵌入图像以该质量重新编码为 JPEG
+    """
+    
+    def __init__(self, compress: bool = True, image_dpi: Optional[int] = None,
+                 jpeg_quality: Optional[int] = None):
+        self.compress = compress
+        self.image_dpi = image_dpi
+        self.jpeg_quality = jpeg_quality
+        
+    def image_pixels(self, width: float, height: float, source_size: tuple) -> tuple:
+        """
+        根据显示尺寸（磅）计算嵌入图像的像素尺寸，不超过原图尺寸
+        """
+        dpi = self.image_dpi or 72
+        return (max(1, min(source_size[0], round(width * dpi / 72))),
+                max(1, min(source_size[1], round(height * dpi / 72))))
+
+
+class ConversionCancelled(BaseException):
+    """
+    转换被取消
+
+    与 asyncio.CancelledError 一样继承 BaseException，
+    不会被各转换方法中的 except Exception 吞掉，能直接传回 convert
+    """
+
+
+class ProgressToken:
+    """
+    转换进度与取消令牌
+
+    on_progress(已处理数, 总数, 单位) 在转换线程中调用，总数未知时为 None，
+    单位为 'page'（PDF页）、'row'（表格行）或 'block'（DOCX段落/表格/图片）；
+    两次回调至少间隔 min_interval 秒（最后一次除外），逐行处理时也不会拖慢转换。
+    cancel() 可在任意线程调用，转换循环每次迭代检查，取消后抛出 ConversionCancelled。
+    """
+    
+    def __init__(self, on_progress=None, min_interval: float = 0.1):
+        self.on_progress = on_progress
+        self.min_interval = min_interval
+        self.done = 0
+        self.total = None
+        self.unit = None
+        self._cancelled = threading.Event()
+        self._last_report = 0.0
+        
+    def cancel(self):
+        self._cancelled.set()
+        
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+        
+    def check(self):
+        if self._cancelled.is_set():
+            raise ConversionCancelled()
+            
+    def start(self, total: Optional[int], unit: str):
+        """
+        开始一个新的处理阶段
+        """
+        self.check()
+        self.done = 0
+        self.total = total
+        self.unit = unit
+        self._report(force=True)
+        
+    def advance(self, count: int = 1):
+        """
+        记录已处理 count 个单位，并检查是否已取消
+        """
+        self.check()
+        self.done += count
+        self._report(force=self.total is not None and self.done >= self.total)
+        
+    def _report(self, force: bool = False):
+        if self.on_progress is None:
+            return
+        now = time.monotonic()
+        if force or now - self._last_report >= self.min_interval:
+            self._last_report = now
+            self.on_progress(self.done, self.total, self.unit)
+
+
+class ConversionResult:
+    """
+    转换结果
+
+    可直接作为布尔值使用（与原先返回 bool 的接口兼容），并附带输出文件信息；
+    status 为 'ok'、'failed'、'cancelled'，在工作进程池中超出任务限制时为 'timeout' 或 'oom'，
+    批量任务恢复时跳过的已完成任务为 'skipped'
+    """
+    
+    def __init__(self, success: bool, output_path: str, status: Optional[str] = None):
+        self.success = bool(success)
+        self.output_path = output_path
+        self.status = status or ('ok' if self.success else 'failed')
+        self.output_size = None
+        if self.success and output_path and os.path.exists(output_path):
+            self.output_size = os.path.getsize(output_path)
+            
+    def __bool__(self):
+        return self.success
+        
+    def __repr__(self):
+        return (f"ConversionResult(success={self.success}, status={self.status!r}, "
+                f"output_path={self.output_path!r}, output_size={self.output_size})")
+
+
+class RenderContext:
+    """
+    reportlab 渲染上下文
+
+    样式表、表格样式和已注册的字体在每个进程中只构建一次，
+    所有转换共用，避免每个文档重复初始化。这些对象在使用中不会被修改。
+    """
+    
     def __init__(self):
+        self.styles = getSampleStyleSheet()
+        
+        # Word转PDF的表格样式
+        self.docx_table_style = TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 14),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black)
+        ])
+        
+        # 表格转PDF的表格样式
+        self.spreadsheet_table_style = TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ('FONTSIZE', (0, 1), (-1, -1), 8)
+        ])
+        
+        # 已注册的字体：用途 -> reportlab 字体名
+        self.fonts = {}
+        self._cjk_styles = {}
+        self._lock = threading.Lock()
+        
+    def cjk_font(self) -> str:
+        """
+        CJK字体名（首次使用时注册）
+        """
+        if 'cjk' not in self.fonts:
+            self.fonts['cjk'] = get_cjk_font()
+        return self.fonts['cjk']
+        
+    def paragraph_style(self, name: str, text: str) -> ParagraphStyle:
+        """
+        根据文本内容选择段落样式，含中日韩字符时使用CJK字体
+        """
+        if not contains_cjk(text):
+            return self.styles[name]
+        if name not in self._cjk_styles:
+            with self._lock:
+                if name not in self._cjk_styles:
+                    self._cjk_styles[name] = ParagraphStyle(
+                        f'{name}-CJK', parent=self.styles[name],
+                        fontName=self.cjk_font(), wordWrap='CJK')
+        return self._cjk_styles[name]
+        
+    def apply_cjk_font(self, table: Table, data: list):
+        """
+        表格中含有中日韩字符时，整张表格改用CJK字体
+        """
+        if any(contains_cjk(cell) for row in data for cell in row if isinstance(cell, str)):
+            table.setStyle(TableStyle([('FONTNAME', (0, 0), (-1, -1), self.cjk_font())]))
+
+
+_render_context = None
+_render_context_lock = threading.Lock()
+
+
+def get_render_context() -> RenderContext:
+    """
+    获取当前进程的渲染上下文（首次调用时构建）
+    """
+    global _render_context
+    if _render_context is None:
+        with _render_context_lock:
+            if _render_context is None:
+                _render_context = RenderContext()
+    return _render_context
+
+
+def reset_render_context():
+    """
+    丢弃当前进程的渲染上下文，下次使用时重新构建（用于基准测试）
+    """
+    global _render_context
+    with _render_context_lock:
+        _render_context = None
+
+
+class _DocxImage(Flowable):
+    """
+    引用缓存 ImageReader 的图片流式对象，超出页面可用区域时按比例缩小
+    """
+    
+    def __init__(self, reader: ImageReader, width: float, height: float, max_height: float):
+        super().__init__()
+        self.reader = reader
+        self.image_width, self.image_height = _docx_image_size(reader, width, height)
+        self.max_height = max_height
+        
+    def wrap(self, available_width, available_height):
+        scale = min(1.0, available_width / self.image_width, self.max_height / self.image_height)
+        self.draw_width = self.image_width * scale
+        self.draw_height = self.image_height * scale
+        return self.draw_width, self.draw_height
+        
+    def draw(self):
+        self.canv.drawImage(self.reader, 0, 0, self.draw_width, self.draw_height, mask='auto')
+
+
+def _docx_image_size(reader: ImageReader, width: float, height: float) -> tuple:
+    """
+    DOCX中没有尺寸信息时，按 96 DPI 换算图片的像素尺寸（单位：磅）
+    """
+    if width and height:
+        return width, height
+    px_width, px_height = reader.getSize()
+    return px_width * 0.75, px_height * 0.75
+
+
+class FileConverter:
+    def __init__(self, memory_budget_mb: int = DEFAULT_MEMORY_BUDGET_MB, mmap_input: Optional[bool] = None,
+                 text_cache: Union[TextCache, bool] = True, text_extractor: Optional[str] = None,
+                 fsync_output: bool = False, pdf_checkpoint: bool = True):
         self.supported_formats = {
             'image': ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.webp'],
             'document': ['.pdf', '.docx'],
             'spreadsheet': ['.csv', '.xlsx', '.xls'],
             'markdown': ['.md']
         }
+        self.memory_budget_mb = memory_budget_mb
+        # 是否以内存映射方式读取PDF源文件，None 表示按文件大小自动选择
+        self.mmap_input = mmap_input
+        # PDF提取文本的按页缓存：True 使用进程共享的默认缓存，False 不缓存
+        if text_cache is True:
+            text_cache = get_default_text_cache()
+        self.text_cache = text_cache or None
+        # PDF文本提取后端名，None 表示使用环境变量 FTR_PDF_EXTRACTOR 或默认的 PyPDF2
+        self.text_extractor = text_extractor
+        # 输出重命名前是否 fsync（防止断电后出现截断的文件，代价是每个输出一次同步写盘）
+        self.fsync_output = fsync_output
+        # 长PDF转Word/Markdown时是否在输出旁写分页检查点，中断后重跑从检查点继续
+        self.pdf_checkpoint = pdf_checkpoint
         
-    def convert(self, source_path: str, output_path: str, target_format: str) -> bool:
+    def convert(self, source_path: str, output_path: str, target_format: str,
+                memory_budget_mb: Optional[int] = None, incremental: Optional[bool] = None,
+                pdf_options: Optional[PdfOptions] = None,
+                token: Optional[ProgressToken] = None,
+                fsync: Optional[bool] = None) -> ConversionResult:
         """
         主转换方法
+
+        memory_budget_mb 为本次任务的内存预算，未指定时使用实例的默认值；
+        incremental 控制DOCX/表格转PDF是否分段渲染，未指定时按源文件大小自动选择；
+        pdf_options 控制生成PDF时的压缩和嵌入图像质量；
+        token 用于报告进度和取消任务；
+        fsync 控制输出重命名前是否落盘，未指定时使用实例的 fsync_output。
+        输出先写入同目录的临时文件，成功后才重命名为 output_path，失败、取消或进程被终止
+        都不会留下截断的输出；长PDF转Word/Markdown的已提取页面保存在 output_path.ckpt，
+        重跑时从检查点继续。返回 ConversionResult，可直接当作布尔值判断是否成功
         """
+        temp_path = None
         try:
             if not os.path.exists(source_path):
                 raise FileNotFoundError(f"源文件不存在: {source_path}")
                 
-            source_ext = os.path.splitext(source_path)[1].lower()
+            source_ext = self._source_format(source_path)
             target_ext = f".{target_format.lower()}"
+            if source_ext != canonical_ext(os.path.splitext(source_path)[1]):
+                print(f"文件扩展名与内容不符: {source_path} 实际为 {source_ext[1:].upper()}")
             
             # 确保输出目录存在
             output_dir = os.path.dirname(output_path)
             if output_dir and not os.path.exists(output_dir):
                 os.makedirs(output_dir)
                 
+            if token is not None:
+                token.check()
+                
+            temp_path = temp_output_path(output_path)
+            checkpoint_path = checkpoint_path_for(output_path) if self.pdf_checkpoint else None
+            
             # 根据文件类型调用相应的转换方法
             if source_ext in self.supported_formats['image']:
-                return self._convert_image(source_path, output_path, target_format)
+                budget = memory_budget_mb or self.memory_budget_mb
+                success = self._convert_image(source_path, temp_path, target_format, budget, pdf_options)
             elif source_ext in self.supported_formats['document']:
-                return self._convert_document(source_path, output_path, target_format)
+                success = self._convert_document(source_path, temp_path, target_format,
+                                                 incremental, pdf_options, token, checkpoint_path)
             elif source_ext in self.supported_formats['spreadsheet']:
-                return self._convert_spreadsheet(source_path, output_path, target_format)
+                success = self._convert_spreadsheet(source_path, temp_path, target_format,
+                                                    incremental, pdf_options, token)
             elif target_format.upper() == 'MD' and source_ext == '.pdf':
-                return self._pdf_to_markdown(source_path, output_path)
+                success = self._pdf_to_markdown(source_path, temp_path, token, checkpoint_path)
             else:
                 raise ValueError(f"不支持的源文件格式: {source_ext}")
                 
+            if success:
+                commit_output(temp_path, output_path, self.fsync_output if fsync is None else fsync)
+                if checkpoint_path:
+                    remove_checkpoint(output_path)
+            return ConversionResult(success, output_path)
+            
+        except ConversionCancelled:
+            print(f"转换已取消: {source_path}")
+            return ConversionResult(False, output_path, 'cancelled')
+                
         except Exception as e:
             print(f"转换错误: {e}")
-            return False
+            return ConversionResult(False, output_path)
+            
+        finally:
+            # 成功时临时文件已被重命名，这里只清理失败或取消留下的部分输出
+            if temp_path is not None and os.path.exists(temp_path):
+                discard_output(temp_path)
             
-    def _convert_image(self, source_path: str, output_path: str, target_format: str) -> bool:
+    @staticmethod
+    def _source_format(source_path: str) -> str:
+        """
+        按文件内容识别源格式，返回规范扩展名（结果按路径和修改时间缓存）
+
+        扩展名与内容不符时以内容为准；无法识别的二进制内容立即报错，不再尝试解析
+        """
+        sniffed = sniff_format(source_path)
+        if sniffed is None:
+            raise ValueError(f"无法识别的文件内容: {source_path}")
+        return sniffed
+        
+    async def aconvert(self, source_path: str, output_path: str, target_format: str,
+                       executor=None, timeout: Optional[float] = None, **options) -> ConversionResult:
+        """
+        异步转换，在 executor 中执行 convert，不阻塞事件循环
+
+        executor 可以是线程池、进程池或 WarmWorkerPool，None 表示事件循环的默认线程池；
+        options 为 convert 的其余关键字参数。超过 timeout 秒抛出 asyncio.TimeoutError。
+        取消或超时后尚未开始的任务不再执行；已在线程中运行的转换通过 options 中的 token
+        协作取消（token 只能用于线程池），未提供 token 时会在后台执行完毕。
+        """
+        loop = asyncio.get_running_loop()
+        call = functools.partial(self.convert, source_path, output_path, target_format, **options)
+        try:
+            return await asyncio.wait_for(loop.run_in_executor(executor, call), timeout)
+        except (asyncio.CancelledError, asyncio.TimeoutError):
+            token = options.get('token')
+            if token is not None:
+                token.cancel()
+            raise
+        
+    async def aconvert_many(self, jobs: list, concurrency: Optional[int] = None, executor=None,
+                            timeout: Optional[float] = None, return_exceptions: bool = False,
+                            token_factory: Optional[Callable[[tuple], ProgressToken]] = None,
+                            **options) -> list:
+        """
+        异步批量转换
+
+        jobs 为 (源路径, 输出路径, 目标格式) 列表，按顺序返回结果列表。
+        同时执行的任务数不超过 concurrency（默认CPU核数），timeout 为单个任务的超时。
+        return_exceptions 与 asyncio.gather 相同：为 False 时第一个异常（如超时）直接抛出并取消其余任务。
+        每个任务使用各自的 ProgressToken，一个任务超时只取消它自己：token_factory(job) 返回该任务的 token
+        （可带各自的进度回调）；未指定时在线程池中执行的任务自动创建，用于超时后的协作取消。
+        """
+        if 'token' in options:
+            raise ValueError("aconvert_many 为每个任务使用独立的 token，请通过 token_factory 提供")
+        semaphore = asyncio.Semaphore(concurrency or os.cpu_count() or 1)
+        # token 只能用于线程池（进程间无法共享取消状态）
+        in_threads = executor is None or isinstance(executor, ThreadPoolExecutor)
+        
+        async def run(job):
+            async with semaphore:
+                if token_factory is not None:
+                    token = token_factory(job)
+                else:
+                    token = ProgressToken() if in_threads else None
+                return await self.aconvert(*job, executor=executor, timeout=timeout, token=token, **options)
+                
+        tasks = [asyncio.ensure_future(run(job)) for job in jobs]
+        try:
+            return await asyncio.gather(*tasks, return_exceptions=return_exceptions)
+        finally:
+            for task in tasks:
+                task.cancel()
+            
+    def _convert_image(self, source_path: str, output_path: str, target_format: str,
+                       memory_budget_mb: int = DEFAULT_MEMORY_BUDGET_MB,
+                       pdf_options: Optional[PdfOptions] = None) -> bool:
         """
         图像格式转换
         """
         try:
             if target_format.upper() == 'PDF':
-                return self._image_to_pdf(source_path, output_path)
+                return self._image_to_pdf(source_path, output_path, memory_budget_mb, pdf_options)
             else:
-                with Image.open(source_path) as img:
+                with self._open_image(source_path) as img:
+                    # 解码前检查内存预算，超出预算的图像直接拒绝
+                    flatten = target_format.upper() in ['JPG', 'JPEG'] and self._has_alpha(img)
+                    needed = self._estimate_image_bytes(img, extra_bpp=4 if flatten else 0)
+                    self._check_memory_budget(source_path, needed, memory_budget_mb)
+                    
                     # 处理RGBA图像转换为RGB
-                    if img.mode in ('RGBA', 'LA') and target_format.upper() in ['JPG', 'JPEG']:
-                        background = Image.new('RGB', img.size, (255, 255, 255))
-                        background.paste(img, mask=img.split()[-1])
-                        img = background
+                    if flatten:
+                        img = self._flatten_alpha(img)
+                    elif target_format.upper() in ['JPG', 'JPEG'] and img.mode not in ('RGB', 'L', 'CMYK'):
+                        img = img.convert('RGB')
                     
                     # 保存为目标格式
                     format_name = target_format.upper()
@@ -101,18 +526,228 @@ class FileConverter:
         except Exception as e:
             print(f"图像转换错误: {e}")
             return False
+
+    @staticmethod
+    def _open_image(source_path: str) -> Image.Image:
+        """
+        惰性打开图像（只读取文件头）
+
+        Pillow 的 MAX_IMAGE_PIXELS 限制由任务内存预算代替，
+        因此打开时临时关闭该检查，真正的检查在解码前进行。
+        """
+        with _IMAGE_OPEN_LOCK:
+            saved_limit = Image.MAX_IMAGE_PIXELS
+            Image.MAX_IMAGE_PIXELS = None
+            try:
+                return Image.open(source_path)
+            finally:
+                Image.MAX_IMAGE_PIXELS = saved_limit
+
+    @staticmethod
+    def _has_alpha(img: Image.Image) -> bool:
+        """
+        判断图像是否带透明通道
+        """
+        return img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info)
+
+    @staticmethod
+    def _estimate_image_bytes(img: Image.Image, extra_bpp: int = 0) -> int:
+        """
+        根据文件头中的尺寸和模式估算解码所需内存（字节）
+
+        Pillow 内部的 RGB 等多通道图像按每像素4字节存储
+        """
+        width, height = img.size
+        if img.mode in ('1', 'L', 'P'):
+            bpp = 1
+        elif img.mode.startswith('I;16'):
+            bpp = 2
+        else:
+            bpp = 4
+        return width * height * (bpp + extra_bpp)
+
+    @staticmethod
+    def _check_memory_budget(source_path: str, needed_bytes: int, memory_budget_mb: int):
+        """
+        超出内存预算时在解码前拒绝
+        """
+        if memory_budget_mb and needed_bytes > memory_budget_mb * 1024 * 1024:
+            raise MemoryError(
+                f"图像过大: {os.path.basename(source_path)} 预计需要 "
+                f"{needed_bytes / (1024 * 1024):.0f} MB，超出内存预算 {memory_budget_mb} MB"
+            )
+
+    def _flatten_alpha(self, img: Image.Image) -> Image.Image:
+        """
+        分条带将透明图像合成到白色背景上
+
+        每次只处理一个条带，避免 split() 和整幅背景带来的多份全尺寸副本；
+        调色板图像也逐条带转换为 RGBA，不生成整幅的 RGBA 副本（与内存预算的估算一致）
+        """
+        width, height = img.size
+        rows = max(1, IMAGE_STRIP_BYTES // max(1, width * 4))
+        background = Image.new('RGB', img.size, (255, 255, 255))
+        for top in range(0, height, rows):
+            box = (0, top, width, min(height, top + rows))
+            strip = img.crop(box)
+            if strip.mode == 'P':
+                strip = strip.convert('RGBA')
+            background.paste(strip, box[:2], strip)
+        return background
+            
+    def convert_images(self, jobs: list, max_workers: Optional[int] = None,
+                       dedupe: bool = False, dedupe_threshold: Optional[int] = None) -> list:
+        """
+        批量图像转换（多进程，像素经共享内存传递）
+
+        jobs 为 (源路径, 输出路径, 目标格式) 列表，返回对应的结果列表。
+        dedupe 为 True 时先按感知哈希归并视觉上相同的图像，每组只转换一次，
+        其余输出链接到代表输出。
+        """
+        from image_batch import convert_images_batch
+        for _, output_path, _ in jobs:
+            output_dir = os.path.dirname(output_path)
+            if output_dir:
+                os.makedirs(output_dir, exist_ok=True)
+                
+        if not dedupe:
+            return convert_images_batch(jobs, max_workers=max_workers,
+                                        memory_budget_mb=self.memory_budget_mb)
+            
+        from image_dedup import DEFAULT_HASH_THRESHOLD, link_output, plan_dedup
+        threshold = DEFAULT_HASH_THRESHOLD if dedupe_threshold is None else dedupe_threshold
+        to_run, aliases = plan_dedup(jobs, threshold)
+        
+        results = [False] * len(jobs)
+        batch_results = convert_images_batch([jobs[i] for i in to_run], max_workers=max_workers,
+                                             memory_budget_mb=self.memory_budget_mb)
+        for job_index, ok in zip(to_run, batch_results):
+            results[job_index] = ok
+            
+        for job_index, representative in aliases.items():
+            if not results[representative]:
+                continue
+            try:
+                link_output(jobs[representative][1], jobs[job_index][1])
+                results[job_index] = True
+            except Exception as e:
+                print(f"图像转换错误: {e}")
+        return results
+
+    def convert_renditions(self, source_path: str, renditions: list,
+                           max_workers: Optional[int] = None,
+                           memory_budget_mb: Optional[int] = None) -> list:
+        """
+        单次解码、多路输出的图像转换
+
+        renditions 为字典列表，每项包含:
+            output  输出路径
+            format  目标格式 (JPG, PNG, GIF, BMP, WEBP, PDF)
+            size    可选，最长边像素数或 (宽, 高)，按比例缩小
+            preset  可选，IMAGE_PRESETS 中的编码预设名
+        max_workers 大于1时在线程中并行编码（Pillow 编码时会释放GIL）。
+        返回与 renditions 顺序一致的结果列表。
+        """
+        budget = memory_budget_mb or self.memory_budget_mb
+        try:
+            if not os.path.exists(source_path):
+                raise FileNotFoundError(f"源文件不存在: {source_path}")
+                
+            for rendition in renditions:
+                output_dir = os.path.dirname(rendition['output'])
+                if output_dir and not os.path.exists(output_dir):
+                    os.makedirs(output_dir, exist_ok=True)
+                    
+            with self._open_image(source_path) as img:
+                # 所有输出都需要缩小时，按最大的输出尺寸进行草稿解码
+                pdf_box = tuple(int(v) + 1 for v in self._pdf_image_size(img.size))
+                sizes = [pdf_box if r['format'].upper() == 'PDF' else self._rendition_box(r.get('size'))
+                         for r in renditions]
+                if sizes and all(sizes):
+                    img.draft('RGB', (max(w for w, _ in sizes), max(h for _, h in sizes)))
+                    
+                flatten = self._has_alpha(img) and any(
+                    r['format'].upper() in ['JPG', 'JPEG'] for r in renditions)
+                needed = self._estimate_image_bytes(img, extra_bpp=4 if flatten else 0)
+                self._check_memory_budget(source_path, needed, budget)
+                
+                # 只解码一次，透明通道也只合成一次
+                img.load()
+                flattened = self._flatten_alpha(img) if flatten else None
+                
+                def render(rendition):
+                    try:
+                        return self._write_rendition(img, flattened, rendition)
+                    except Exception as e:
+                        print(f"图像转换错误: {rendition['output']}: {e}")
+                        return False
+                        
+                if max_workers and max_workers > 1 and len(renditions) > 1:
+                    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                        return list(executor.map(render, renditions))
+                return [render(rendition) for rendition in renditions]
+                
+        except Exception as e:
+            print(f"图像转换错误: {e}")
+            return [False] * len(renditions)
+
+    @staticmethod
+    def _rendition_box(size) -> Optional[tuple]:
+        """
+        将输出尺寸规范化为 (宽, 高) 边界框
+        """
+        if not size:
+            return None
+        if isinstance(size, int):
+            return size, size
+        return tuple(size)
+
+    def _write_rendition(self, img: Image.Image, flattened: Optional[Image.Image], rendition: dict) -> bool:
+        """
+        从已解码的图像生成一路输出
+        """
+        format_name = rendition['format'].upper()
+        
+        if format_name == 'PDF':
+            with atomic_output(rendition['output'], self.fsync_output) as temp_path:
+                self._write_image_pdf(img, temp_path)
+            return True
             
-    def _convert_document(self, source_path: str, output_path: str, target_format: str) -> bool:
+        if format_name == 'JPG':
+            format_name = 'JPEG'
+        if format_name == 'JPEG':
+            if flattened is not None:
+                img = flattened
+            elif img.mode not in ('RGB', 'L', 'CMYK'):
+                img = img.convert('RGB')
+                
+        box = self._rendition_box(rendition.get('size'))
+        if box:
+            img = img.copy()
+            img.thumbnail(box, Image.Resampling.LANCZOS)
+            
+        params = IMAGE_PRESETS[rendition.get('preset') or 'default']
+        with atomic_output(rendition['output'], self.fsync_output) as temp_path:
+            img.save(temp_path, format=format_name, **params)
+        return True
+
+    def _convert_document(self, source_path: str, output_path: str, target_format: str,
+                          incremental: Optional[bool] = None,
+                          pdf_options: Optional[PdfOptions] = None,
+                          token: Optional[ProgressToken] = None,
+                          checkpoint_path: Optional[str] = None) -> bool:
         """
         文档格式转换
         """
         try:
-            source_ext = os.path.splitext(source_path)[1].lower()
+            source_ext = self._source_format(source_path)
             
             if source_ext == '.pdf' and target_format.upper() == 'DOCX':
-                return self._pdf_to_docx(source_path, output_path)
+                return self._pdf_to_docx(source_path, output_path, token, checkpoint_path)
+            elif source_ext == '.pdf' and target_format.upper() == 'MD':
+                return self._pdf_to_markdown(source_path, output_path, token, checkpoint_path)
             elif source_ext == '.docx' and target_format.upper() == 'PDF':
-                return self._docx_to_pdf(source_path, output_path)
+                return self._docx_to_pdf(source_path, output_path, incremental, pdf_options, token)
             else:
                 # 如果是相同格式，直接复制
                 shutil.copy2(source_path, output_path)
@@ -122,12 +757,15 @@ class FileConverter:
             print(f"文档转换错误: {e}")
             return False
             
-    def _convert_spreadsheet(self, source_path: str, output_path: str, target_format: str) -> bool:
+    def _convert_spreadsheet(self, source_path: str, output_path: str, target_format: str,
+                             incremental: Optional[bool] = None,
+                             pdf_options: Optional[PdfOptions] = None,
+                             token: Optional[ProgressToken] = None) -> bool:
         """
         表格格式转换
         """
         try:
-            source_ext = os.path.splitext(source_path)[1].lower()
+            source_ext = self._source_format(source_path)
             
             if source_ext == '.csv' and target_format.upper() == 'XLSX':
                 df = pd.read_csv(source_path, encoding='utf-8')
@@ -138,7 +776,7 @@ class FileConverter:
                 df.to_csv(output_path, index=False, encoding='utf-8')
                 return True
             elif source_ext in ['.csv', '.xlsx', '.xls'] and target_format.upper() == 'PDF':
-                return self._spreadsheet_to_pdf(source_path, output_path)
+                return self._spreadsheet_to_pdf(source_path, output_path, incremental, pdf_options, token)
             else:
                 # 如果是相同格式，直接复制
                 shutil.copy2(source_path, output_path)
@@ -148,197 +786,824 @@ class FileConverter:
             print(f"表格转换错误: {e}")
             return False
             
-    def _image_to_pdf(self, source_path: str, output_path: str) -> bool:
+    def _image_to_pdf(self, source_path: str, output_path: str,
+                      memory_budget_mb: int = DEFAULT_MEMORY_BUDGET_MB,
+                      pdf_options: Optional[PdfOptions] = None) -> bool:
         """
         图像转PDF
         """
         try:
-            doc = SimpleDocTemplate(output_path, pagesize=letter)
-            story = []
-            
-            with Image.open(source_path) as img:
-                # 计算适合页面的尺寸
-                page_width, page_height = letter
-                img_width, img_height = img.size
-                
-                # 计算缩放比例
-                scale_w = (page_width - 2 * inch) / img_width
-                scale_h = (page_height - 2 * inch) / img_height
-                scale = min(scale_w, scale_h)
-                
-                new_width = img_width * scale
-                new_height = img_height * scale
-                
-                # 临时保存调整后的图像
-                with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as tmp:
-                    resized_img = img.resize((int(new_width), int(new_height)), Image.Resampling.LANCZOS)
-                    resized_img.save(tmp.name, 'PNG')
-                    
-                    # 添加到PDF
-                    rl_img = RLImage(tmp.name, width=new_width, height=new_height)
-                    story.append(rl_img)
-                    
-                doc.build(story)
-                
-                # 清理临时文件
-                os.unlink(tmp.name)
+            with self._open_image(source_path) as img:
+                # JPEG 等格式可直接按缩小的尺寸解码，大幅减少内存占用
+                options = pdf_options or PdfOptions()
+                new_width, new_height = self._pdf_image_size(img.size)
+                img.draft('RGB', options.image_pixels(new_width, new_height, img.size))
+                self._check_memory_budget(source_path, self._estimate_image_bytes(img), memory_budget_mb)
+                self._write_image_pdf(img, output_path, options)
                 
             return True
             
         except Exception as e:
             print(f"图像转PDF错误: {e}")
             return False
-            
-    def _pdf_to_docx(self, source_path: str, output_path: str) -> bool:
+
+    @staticmethod
+    def _pdf_image_size(size: tuple) -> tuple:
         """
-        PDF转Word（简单文本提取）
+        计算图像放入PDF页面后的尺寸
+        """
+        page_width, page_height = letter
+        img_width, img_height = size
+        
+        # 计算缩放比例
+        scale_w = (page_width - 2 * inch) / img_width
+        scale_h = (page_height - 2 * inch) / img_height
+        scale = min(scale_w, scale_h)
+        
+        return img_width * scale, img_height * scale
+
+    def _write_image_pdf(self, img: Image.Image, output_path: str, pdf_options: Optional[PdfOptions] = None):
         """
+        将已解码的图像写入PDF
+        """
+        options = pdf_options or PdfOptions()
+        doc = self._pdf_template(output_path, options)
+        new_width, new_height = self._pdf_image_size(img.size)
+        
+        # 按目标分辨率降采样，设置了JPEG质量且无透明通道时以JPEG嵌入
+        pixel_size = options.image_pixels(new_width, new_height, img.size)
+        resized_img = img.resize(pixel_size, Image.Resampling.LANCZOS) if pixel_size != img.size else img
+        as_jpeg = bool(options.jpeg_quality) and not self._has_alpha(resized_img)
+        
+        # 临时保存调整后的图像
+        with tempfile.NamedTemporaryFile(suffix='.jpg' if as_jpeg else '.png', delete=False) as tmp:
+            if as_jpeg:
+                if resized_img.mode not in ('RGB', 'L', 'CMYK'):
+                    resized_img = resized_img.convert('RGB')
+                resized_img.save(tmp.name, 'JPEG', quality=options.jpeg_quality)
+            else:
+                resized_img.save(tmp.name, 'PNG')
+        
         try:
-            doc = Document()
+            # 添加到PDF
+            rl_img = RLImage(tmp.name, width=new_width, height=new_height)
+            doc.build([rl_img])
+        finally:
+            # 清理临时文件
+            os.unlink(tmp.name)
+
+    @staticmethod
+    def _pdf_template(output_path: str, pdf_options: Optional[PdfOptions] = None) -> SimpleDocTemplate:
+        """
+        按输出选项创建PDF文档模板
+        """
+        options = pdf_options or PdfOptions()
+        return SimpleDocTemplate(output_path, pagesize=letter, pageCompression=1 if options.compress else 0)
+            
+    @contextmanager
+    def _open_pdf_input(self, source_path: str):
+        """
+        打开PDF源文件供 PyPDF2 读取
+
+        大文件使用只读内存映射：PyPDF2 随机访问对象时直接由操作系统页缓存提供数据，
+        不再经过用户态读缓冲区；多个工作进程映射同一文件时共享同一份物理内存。
+        空文件无法映射，退回普通读取。
+        """
+        with open(source_path, 'rb') as file:
+            size = os.fstat(file.fileno()).st_size
+            use_mmap = self.mmap_input if self.mmap_input is not None else size >= MMAP_PDF_BYTES
+            if not use_mmap or size == 0:
+                yield file
+                return
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                yield mapped
+            finally:
+                mapped.close()
+
+    def _extract_pdf_pages(self, source_path: str, token: Optional[ProgressToken] = None,
+                           checkpoint_path: Optional[str] = None):
+        """
+        逐页提取PDF文本，产出 (页码, 总页数, 文本)
+
+        PDF转Word和PDF转Markdown共用，提取后端由 text_extractor 指定。启用文本缓存时按 (文件内容哈希, 页码) 查询缓存，
+        文件未变（路径、大小、修改时间相同）时沿用记录的哈希，全部命中时不打开PDF；未命中的页面提取后写回缓存并定期提交。
+        指定 checkpoint_path 且页数较多时，已提取的页面分段写入检查点，上次中断的转换从检查点之后继续。
+        """
+        extractor_cls = get_extractor(self.text_extractor)
+        cache = self.text_cache
+        # 不同后端的提取结果不同，缓存键中包含后端名
+        file_key = f'{cache.source_digest(source_path)}:{extractor_cls.name}' if cache else None
+        page_count = cache.get_page_count(file_key) if cache else None
+        
+        with ExitStack() as stack:
+            extractor = None
             
-            with open(source_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
+            def open_extractor():
+                nonlocal extractor
+                if extractor is None:
+                    if extractor_cls.needs_stream:
+                        source = stack.enter_context(self._open_pdf_input(source_path))
+                    else:
+                        source = source_path
+                    extractor = extractor_cls(source)
+                    stack.callback(extractor.close)
+                return extractor
                 
-                for page_num in range(len(pdf_reader.pages)):
-                    page = pdf_reader.pages[page_num]
-                    text = page.extract_text()
+            if page_count is None:
+                page_count = open_extractor().page_count
+                if cache:
+                    cache.put_page_count(file_key, page_count)
+                    
+            done_pages = []
+            checkpoint = None
+            if checkpoint_path and page_count >= CHECKPOINT_MIN_PAGES:
+                checkpoint = stack.enter_context(
+                    PageCheckpoint(checkpoint_path, source_path, extractor_cls.name, page_count))
+                done_pages = checkpoint.load()
+                if done_pages:
+                    print(f"从检查点继续: 已完成 {len(done_pages)}/{page_count} 页")
                     
+            if token is not None:
+                token.start(page_count, 'page')
+                
+            try:
+                for page_num in range(page_count):
+                    if token is not None:
+                        token.check()
+                    if page_num < len(done_pages):
+                        text = done_pages[page_num]
+                    else:
+                        text = cache.get(file_key, page_num) if cache else None
+                        if text is None:
+                            text = open_extractor().extract(page_num)
+                            if cache:
+                                cache.put(file_key, page_num, text)
+                        if checkpoint is not None:
+                            checkpoint.add(page_num, text)
+                    if cache and (page_num + 1) % TEXT_CACHE_COMMIT_PAGES == 0:
+                        cache.commit()
+                    if token is not None:
+                        token.advance()
+                    yield page_num, page_count, text
+            finally:
+                if cache:
+                    cache.flush()
+
+    def select_text_extractor(self, sample_paths: list) -> str:
+        """
+        在样本PDF上测量已安装的文本提取后端，选用最快的一个并返回其名称
+        """
+        self.text_extractor = select_fastest_extractor(sample_paths)
+        return self.text_extractor
+
+    def _pdf_to_docx(self, source_path: str, output_path: str, token: Optional[ProgressToken] = None,
+                     checkpoint_path: Optional[str] = None) -> bool:
+        """
+        PDF转Word（简单文本提取）
+        """
+        try:
+            # 直接流式生成 document.xml，每页开销固定
+            with DocxStreamWriter(output_path) as doc:
+                for page_num, page_count, text in self._extract_pdf_pages(source_path, token, checkpoint_path):
                     if text.strip():
                         doc.add_paragraph(text)
                         
                     # 添加分页符（除了最后一页）
-                    if page_num < len(pdf_reader.pages) - 1:
+                    if page_num < page_count - 1:
                         doc.add_page_break()
                         
-            doc.save(output_path)
             return True
             
         except Exception as e:
             print(f"PDF转Word错误: {e}")
             return False
             
-    def _docx_to_pdf(self, source_path: str, output_path: str) -> bool:
+    def _docx_to_pdf(self, source_path: str, output_path: str, incremental: Optional[bool] = None,
+                     pdf_options: Optional[PdfOptions] = None, token: Optional[ProgressToken] = None) -> bool:
         """
         Word转PDF
+
+        incremental 为 True 时边生成边分段渲染，内存占用与文档长度无关；
+        为 None 时按源文件大小自动选择
         """
         try:
-            doc = Document(source_path)
-            
             # 创建PDF文档
-            pdf_doc = SimpleDocTemplate(output_path, pagesize=letter)
-            styles = getSampleStyleSheet()
-            story = []
+            pdf_doc = self._pdf_template(output_path, pdf_options)
+            header_images = []
             
-            # 添加段落
-            for paragraph in doc.paragraphs:
-                if paragraph.text.strip():
-                    p = Paragraph(paragraph.text, styles['Normal'])
-                    story.append(p)
-                    story.append(Spacer(1, 12))
+            def draw_header(canvas, doc):
+                # 页眉图片（如徽标）每页绘制，PDF中作为同一个XObject引用
+                x = doc.leftMargin
+                max_height = doc.topMargin - 24
+                for reader, width, height in header_images:
+                    scale = min(1.0, max_height / height) if height else 1.0
+                    top = doc.pagesize[1] - 12
+                    canvas.drawImage(reader, x, top - height * scale, width * scale, height * scale, mask='auto')
+                    x += width * scale + 6
                     
-            # 添加表格
-            for table in doc.tables:
-                data = []
-                for row in table.rows:
-                    row_data = []
-                    for cell in row.cells:
-                        row_data.append(cell.text)
-                    data.append(row_data)
-                
-                if data:
-                    t = Table(data)
-                    t.setStyle(TableStyle([
-                        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                        ('FONTSIZE', (0, 0), (-1, 0), 14),
-                        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                        ('GRID', (0, 0), (-1, -1), 1, colors.black)
-                    ]))
-                    story.append(t)
-                    story.append(Spacer(1, 12))
+            with zipfile.ZipFile(source_path) as package:
+                # 文档内的图片只解码一次，重复出现时复用同一个对象（PDF中也只嵌入一次）
+                image_cache = {}
+                
+                if not self._use_incremental(source_path, incremental):
+                    story = list(self._docx_flowables(package, image_cache, header_images,
+                                                      pdf_doc.height, pdf_options, token))
+                    hook = self._page_hook(draw_header, token)
+                    pdf_doc.build(story, onFirstPage=hook, onLaterPages=hook)
+                    return True
                     
-            pdf_doc.build(story)
+                # 分段渲染时第一页就要绘制页眉，先找出正文末尾节属性引用的页眉
+                sect_pr = self._docx_body_sect_pr(package)
+                if sect_pr is not None:
+                    relationships = self._docx_relationships(package, self._docx_main_part(package))
+                    for part_name, width, height in self._docx_header_images(package, sect_pr, relationships):
+                        reader = self._docx_image(package, image_cache, part_name, (width, height), pdf_options)
+                        if reader is not None:
+                            header_images.append((reader,) + _docx_image_size(reader, width, height))
+                            
+                flowables = self._docx_flowables(package, image_cache, None, pdf_doc.height, pdf_options, token)
+                self._build_pdf_in_parts(output_path, flowables, PDF_PART_FLOWABLES, draw_header, pdf_options, token)
             return True
             
         except Exception as e:
             print(f"Word转PDF错误: {e}")
             return False
+
+    def _docx_flowables(self, package: zipfile.ZipFile, image_cache: dict,
+                        header_images: Optional[list], frame_height: float,
+                        pdf_options: Optional[PdfOptions] = None, token: Optional[ProgressToken] = None):
+        """
+        按正文原始顺序惰性生成段落、图片和表格的流式对象
+
+        header_images 不为 None 时，遇到正文末尾的节属性会把页眉图片追加进去
+        """
+        context = get_render_context()
+        if token is not None:
+            token.start(None, 'block')
+        for kind, content in self._iter_docx_blocks(package):
+            if token is not None:
+                token.advance()
+            if kind == 'paragraph':
+                if content.strip():
+                    style = context.paragraph_style('Normal', content)
+                    yield Paragraph(escape(content).replace('\n', '<br/>'), style)
+                    yield Spacer(1, 12)
+                continue
+                
+            if kind == 'image':
+                reader = self._docx_image(package, image_cache, content[0], content[1:], pdf_options)
+                if reader is not None:
+                    yield _DocxImage(reader, content[1], content[2], frame_height)
+                    yield Spacer(1, 12)
+                continue
+                
+            if kind == 'header':
+                if header_images is not None:
+                    for part_name, width, height in content:
+                        reader = self._docx_image(package, image_cache, part_name, (width, height), pdf_options)
+                        if reader is not None:
+                            header_images.append((reader,) + _docx_image_size(reader, width, height))
+                continue
+                
+            data, spans = content
+            if data:
+                t = Table(data)
+                t.setStyle(context.docx_table_style)
+                if spans:
+                    t.setStyle(TableStyle(spans))
+                context.apply_cjk_font(t, data)
+                yield t
+                yield Spacer(1, 12)
+
+    def _docx_body_sect_pr(self, package: zipfile.ZipFile):
+        """
+        不解析XML，分块扫描正文找到最后一个节属性（即正文级 w:sectPr）
+
+        只在分段渲染时使用：第一段输出之前就需要知道页眉
+        """
+        start_marker = re.compile(rb'<w:sectPr[\s>/]')
+        end_marker = b'</w:sectPr>'
+        last = None
+        tail = b''
+        with package.open(self._docx_main_part(package)) as xml_file:
+            while True:
+                chunk = xml_file.read(1024 * 1024)
+                if not chunk:
+                    break
+                buffer = tail + chunk
+                matches = list(start_marker.finditer(buffer))
+                if matches:
+                    last = buffer[matches[-1].start():]
+                elif last is not None:
+                    last += chunk
+                # 保留末尾片段以免标记被分块截断
+                tail = buffer[-16:]
+                if last is not None and len(last) > 1024 * 1024:
+                    last = None
+        if last is None or end_marker not in last:
+            return None
+        fragment = last[:last.index(end_marker) + len(end_marker)]
+        wrapper = (
+            b'<root xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main" '
+            b'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            + fragment + b'</root>'
+        )
+        try:
+            return etree.fromstring(wrapper)[0]
+        except etree.XMLSyntaxError:
+            return None
+
+    def _use_incremental(self, source_path: str, incremental: Optional[bool]) -> bool:
+        """
+        是否使用分段渲染：未指定时按源文件大小自动判断
+        """
+        if incremental is None:
+            return os.path.getsize(source_path) >= INCREMENTAL_PDF_BYTES
+        return incremental
+
+    @staticmethod
+    def _page_hook(on_page=None, token: Optional[ProgressToken] = None):
+        """
+        reportlab 每渲染一页调用的回调：先检查是否已取消，再绘制页面装饰（如页眉）
+
+        build() 排版和渲染期间不经过生成流式对象的循环，只能在页回调中响应取消
+        """
+        def hook(canvas, doc):
+            if token is not None:
+                token.check()
+            if on_page is not None:
+                on_page(canvas, doc)
+        return hook
+
+    def _build_pdf_in_parts(self, output_path: str, flowables, part_size: int, on_page=None,
+                            pdf_options: Optional[PdfOptions] = None, token: Optional[ProgressToken] = None):
+        """
+        分段渲染PDF
+
+        每积累 part_size 个流式对象就渲染成一个分段PDF并释放，
+        最后按页拷贝拼接（不重新渲染、不重新解析内容），峰值内存与总长度无关。
+        """
+        hook = self._page_hook(on_page, token)
+        with tempfile.TemporaryDirectory() as work_dir:
+            parts = []
+            batch = []
+            
+            def flush():
+                if token is not None:
+                    token.check()
+                part_path = os.path.join(work_dir, f'part{len(parts):05d}.pdf')
+                self._pdf_template(part_path, pdf_options).build(batch, onFirstPage=hook, onLaterPages=hook)
+                parts.append(part_path)
+                batch.clear()
+                
+            for flowable in flowables:
+                batch.append(flowable)
+                if len(batch) >= part_size:
+                    flush()
+            if batch or not parts:
+                flush()
+                
+            if len(parts) == 1:
+                shutil.move(parts[0], output_path)
+            else:
+                self._concat_pdfs(parts, output_path)
+
+    @staticmethod
+    def _concat_pdfs(part_paths: list, output_path: str):
+        """
+        按页拼接多个PDF（流式写出，分段间相同的字体和图像只保留一份）
+        """
+        merge_pdfs(part_paths, output_path)
+
+    def merge_pdfs(self, source_paths: list, output_path: str) -> ConversionResult:
+        """
+        合并多个PDF
+
+        按页拷贝页面对象和共享资源，不重新渲染、不提取文本；
+        输出边拷贝边写入，内存占用与总页数基本无关，各输入间相同的字体和图像只写一次。
+        """
+        try:
+            if not source_paths:
+                raise ValueError("没有要合并的PDF")
+            for source_path in source_paths:
+                if not os.path.exists(source_path):
+                    raise FileNotFoundError(f"源文件不存在: {source_path}")
+                    
+            output_dir = os.path.dirname(output_path)
+            if output_dir and not os.path.exists(output_dir):
+                os.makedirs(output_dir)
+                
+            with atomic_output(output_path, self.fsync_output) as temp_path:
+                merge_pdfs(source_paths, temp_path)
+            return ConversionResult(True, output_path)
+            
+        except Exception as e:
+            print(f"PDF合并错误: {e}")
+            return ConversionResult(False, output_path)
+
+    def _iter_docx_blocks(self, package: zipfile.ZipFile):
+        """
+        单次流式遍历DOCX正文XML，按原始顺序产出段落、图片和表格
+
+        产出:
+            ('paragraph', 文本)
+            ('image', (部件路径, 宽, 高))              段落中的内嵌图片，尺寸单位为磅
+            ('table', (单元格数据, 合并单元格样式))
+            ('header', [(部件路径, 宽, 高), ...])     默认页眉中的图片，在正文末尾的节属性处产出
+        直接从XML读取单元格文本，不经过 python-docx 的 row.cells；
+        已处理的节点随即释放，内存占用与文档长度无关。
+        """
+        body_tag = qn('w:body')
+        sdt_content_tag = qn('w:sdtContent')
+        main_part = self._docx_main_part(package)
+        relationships = self._docx_relationships(package, main_part)
+        
+        with package.open(main_part) as xml_file:
+            tags = (qn('w:p'), qn('w:tbl'), qn('w:sectPr'))
+            for _, elem in etree.iterparse(xml_file, events=('end',), tag=tags):
+                parent = elem.getparent()
+                # 只处理正文顶层（含内容控件中）的段落和表格，嵌套的由表格自身处理
+                if parent is None:
+                    continue
+                if parent.tag != body_tag and not (
+                        parent.tag == sdt_content_tag and parent.getparent() is not None
+                        and parent.getparent().getparent() is not None
+                        and parent.getparent().getparent().tag == body_tag):
+                    continue
+                    
+                if elem.tag == qn('w:p'):
+                    yield 'paragraph', self._docx_paragraph_text(elem)
+                    for image in self._docx_paragraph_images(elem, relationships):
+                        yield 'image', image
+                elif elem.tag == qn('w:tbl'):
+                    yield 'table', self._docx_table_data(elem)
+                else:
+                    yield 'header', self._docx_header_images(package, elem, relationships)
+                    
+                # 释放已处理的节点
+                elem.clear()
+                while elem.getprevious() is not None:
+                    del parent[0]
+
+    @staticmethod
+    def _docx_main_part(package: zipfile.ZipFile) -> str:
+        """
+        从包关系中找到主文档部件的路径
+        """
+        try:
+            rels = etree.fromstring(package.read('_rels/.rels'))
+            for rel in rels:
+                if rel.get('Type', '').endswith('/officeDocument'):
+                    return rel.get('Target').lstrip('/')
+        except KeyError:
+            pass
+        return 'word/document.xml'
+
+    @staticmethod
+    def _docx_relationships(package: zipfile.ZipFile, part_name: str) -> dict:
+        """
+        读取部件的关系表，返回 {关系ID: (关系类型, 目标部件路径)}
+        """
+        folder, name = posixpath.split(part_name)
+        try:
+            rels = etree.fromstring(package.read(posixpath.join(folder, '_rels', name + '.rels')))
+        except KeyError:
+            return {}
+        relationships = {}
+        for rel in rels:
+            if rel.get('TargetMode') == 'External':
+                continue
+            target = rel.get('Target', '')
+            if target.startswith('/'):
+                target = target.lstrip('/')
+            else:
+                target = posixpath.normpath(posixpath.join(folder, target))
+            relationships[rel.get('Id')] = (rel.get('Type', '').rsplit('/', 1)[-1], target)
+        return relationships
+
+    @staticmethod
+    def _docx_paragraph_images(p, relationships: dict) -> list:
+        """
+        找出段落中的内嵌图片，返回 [(部件路径, 宽, 高)]，尺寸单位为磅
+        """
+        images = []
+        embed = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}embed'
+        extent_tag = '{http://schemas.openxmlformats.org/drawingml/2006/wordprocessingDrawing}extent'
+        blip_tag = '{http://schemas.openxmlformats.org/drawingml/2006/main}blip'
+        for drawing in p.iter(qn('w:drawing')):
+            extent = next(drawing.iter(extent_tag), None)
+            blip = next(drawing.iter(blip_tag), None)
+            if blip is None or blip.get(embed) not in relationships:
+                continue
+            rel_type, target = relationships[blip.get(embed)]
+            if rel_type != 'image':
+                continue
+            # EMU 转换为磅：1磅 = 12700 EMU
+            width = int(extent.get('cx', 0)) / 12700 if extent is not None else 0
+            height = int(extent.get('cy', 0)) / 12700 if extent is not None else 0
+            images.append((target, width, height))
+        return images
+
+    def _docx_header_images(self, package: zipfile.ZipFile, sect_pr, relationships: dict) -> list:
+        """
+        读取节属性所引用的默认页眉中的图片
+        """
+        r_id = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id'
+        for reference in sect_pr.iterchildren(qn('w:headerReference')):
+            if reference.get(qn('w:type'), 'default') != 'default':
+                continue
+            rel = relationships.get(reference.get(r_id))
+            if rel is None:
+                continue
+            try:
+                header = etree.fromstring(package.read(rel[1]))
+            except KeyError:
+                continue
+            header_relationships = self._docx_relationships(package, rel[1])
+            images = []
+            for p in header.iter(qn('w:p')):
+                images.extend(self._docx_paragraph_images(p, header_relationships))
+            return images
+        return []
+
+    @staticmethod
+    def _docx_image(package: zipfile.ZipFile, cache: dict, part_name: str,
+                    display_size: Optional[tuple] = None, pdf_options: Optional[PdfOptions] = None):
+        """
+        从DOCX包中读取并解码图片，结果按部件路径缓存
+
+        同一部件多次出现时返回同一个 ImageReader，reportlab 据此只嵌入一次。
+        指定了目标分辨率或JPEG质量时，按首次出现的显示尺寸降采样/重新编码。
+        无法解码的格式（如 EMF/WMF）缓存为 None 并跳过。
+        """
+        if part_name not in cache:
+            try:
+                data = package.read(part_name)
+                if pdf_options is not None and (pdf_options.image_dpi or pdf_options.jpeg_quality):
+                    data = FileConverter._recompress_image(data, display_size, pdf_options)
+                reader = ImageReader(io.BytesIO(data))
+                reader.getSize()
+                cache[part_name] = reader
+            except Exception as e:
+                print(f"Word转PDF: 跳过无法识别的图片 {part_name}: {e}")
+                cache[part_name] = None
+        return cache[part_name]
+
+    @staticmethod
+    def _recompress_image(data: bytes, display_size: Optional[tuple], pdf_options: PdfOptions) -> bytes:
+        """
+        按输出选项对嵌入图片降采样并重新编码，结果没有变小时保留原始数据
+        """
+        with Image.open(io.BytesIO(data)) as img:
+            width, height = display_size or (0, 0)
+            if not width or not height:
+                width, height = img.size[0] * 0.75, img.size[1] * 0.75
+            pixel_size = img.size
+            if pdf_options.image_dpi:
+                pixel_size = pdf_options.image_pixels(width, height, img.size)
+            if pixel_size == img.size and not pdf_options.jpeg_quality:
+                return data
+                
+            img.draft('RGB', pixel_size)
+            result = img.resize(pixel_size, Image.Resampling.LANCZOS) if pixel_size != img.size else img.copy()
             
-    def _spreadsheet_to_pdf(self, source_path: str, output_path: str) -> bool:
+        output = io.BytesIO()
+        if FileConverter._has_alpha(result):
+            result.save(output, 'PNG', optimize=True)
+        else:
+            if result.mode not in ('RGB', 'L', 'CMYK'):
+                result = result.convert('RGB')
+            result.save(output, 'JPEG', quality=pdf_options.jpeg_quality or 85)
+        return output.getvalue() if output.tell() < len(data) else data
+
+    @staticmethod
+    def _docx_paragraph_text(p) -> str:
+        """
+        读取段落XML中的文本（制表符和换行一并保留）
+        """
+        run_tag = qn('w:r')
+        text_tag = qn('w:t')
+        parts = []
+        for node in p.iter(text_tag, qn('w:tab'), qn('w:br'), qn('w:cr')):
+            if node.tag == text_tag:
+                parts.append(node.text or '')
+            elif node.getparent().tag != run_tag:
+                # 段落属性中的制表位定义等不是文本
+                continue
+            elif node.tag == qn('w:tab'):
+                parts.append('\t')
+            else:
+                parts.append('\n')
+        return ''.join(parts)
+
+    def _docx_table_data(self, tbl) -> tuple:
+        """
+        直接从表格XML读取单元格文本，并把横向/纵向合并转换为 reportlab 的 SPAN 样式
+        """
+        val = qn('w:val')
+        data = []
+        spans = []
+        open_merges = {}  # 列号 -> [起始行, 结束行, 跨列数]
+        
+        def close_merge(col):
+            start, end, width = open_merges.pop(col)
+            if end > start or width > 1:
+                spans.append(('SPAN', (col, start), (col + width - 1, end)))
+                
+        for tr in tbl.iter(qn('w:tr')):
+            # 跳过嵌套表格中的行
+            if self._owning_table(tr) is not tbl:
+                continue
+            row_index = len(data)
+            row = []
+            tr_pr = tr.find(qn('w:trPr'))
+            grid_before = tr_pr.find(qn('w:gridBefore')) if tr_pr is not None else None
+            if grid_before is not None:
+                row.extend([''] * int(grid_before.get(val, 0)))
+                
+            for tc in tr.iter(qn('w:tc')):
+                if self._owning_table(tc) is not tbl:
+                    continue
+                col = len(row)
+                width, vmerge = 1, None
+                tc_pr = tc.find(qn('w:tcPr'))
+                if tc_pr is not None:
+                    grid_span = tc_pr.find(qn('w:gridSpan'))
+                    if grid_span is not None:
+                        width = max(1, int(grid_span.get(val, 1)))
+                    v_merge = tc_pr.find(qn('w:vMerge'))
+                    if v_merge is not None:
+                        vmerge = v_merge.get(val, 'continue')
+                        
+                if vmerge == 'continue' and col in open_merges:
+                    open_merges[col][1] = row_index
+                    text = ''
+                else:
+                    if col in open_merges:
+                        close_merge(col)
+                    text = '\n'.join(self._docx_paragraph_text(p) for p in tc.iter(qn('w:p')))
+                    if vmerge == 'restart' or width > 1:
+                        open_merges[col] = [row_index, row_index, width]
+                        
+                row.append(text)
+                row.extend([''] * (width - 1))
+            data.append(row)
+            
+        for col in list(open_merges):
+            close_merge(col)
+            
+        # reportlab 要求每行列数一致
+        columns = max((len(row) for row in data), default=0)
+        for row in data:
+            row.extend([''] * (columns - len(row)))
+        return data, spans
+
+    @staticmethod
+    def _owning_table(elem):
+        """
+        返回元素所属的最近一层表格
+        """
+        tbl_tag = qn('w:tbl')
+        parent = elem.getparent()
+        while parent is not None and parent.tag != tbl_tag:
+            parent = parent.getparent()
+        return parent
+            
+    def _spreadsheet_to_pdf(self, source_path: str, output_path: str, incremental: Optional[bool] = None,
+                            pdf_options: Optional[PdfOptions] = None,
+                            token: Optional[ProgressToken] = None) -> bool:
         """
         表格转PDF
+
+        incremental 为 True 时分块读取数据并分段渲染，内存占用与行数无关；
+        为 None 时按源文件大小自动选择
         """
         try:
+            source_ext = self._source_format(source_path)
+            if self._use_incremental(source_path, incremental):
+                flowables = self._spreadsheet_flowables(source_path, source_ext, token)
+                part_size = max(1, SPREADSHEET_ROWS_PER_PART // SPREADSHEET_ROWS_PER_TABLE)
+                self._build_pdf_in_parts(output_path, flowables, part_size, pdf_options=pdf_options, token=token)
+                return True
+                
             # 读取数据
-            source_ext = os.path.splitext(source_path)[1].lower()
             if source_ext == '.csv':
                 df = pd.read_csv(source_path, encoding='utf-8')
             else:
                 df = pd.read_excel(source_path)
                 
             # 创建PDF文档
-            doc = SimpleDocTemplate(output_path, pagesize=letter)
-            styles = getSampleStyleSheet()
+            doc = self._pdf_template(output_path, pdf_options)
+            context = get_render_context()
             story = []
             
             # 添加标题
-            title = Paragraph("数据表格", styles['Title'])
+            title_text = "数据表格"
+            title = Paragraph(title_text, context.paragraph_style('Title', title_text))
             story.append(title)
             story.append(Spacer(1, 12))
             
             # 准备表格数据
             data = [df.columns.tolist()]  # 添加列头
+            if token is not None:
+                token.start(len(df), 'row')
             for index, row in df.iterrows():
+                if token is not None:
+                    token.advance()
                 data.append([str(cell) for cell in row.tolist()])
                 
             # 创建表格
             t = Table(data)
-            t.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 10),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                ('FONTSIZE', (0, 1), (-1, -1), 8)
-            ]))
+            t.setStyle(context.spreadsheet_table_style)
+            context.apply_cjk_font(t, data)
             
             story.append(t)
-            doc.build(story)
+            hook = self._page_hook(token=token)
+            doc.build(story, onFirstPage=hook, onLaterPages=hook)
             return True
             
         except Exception as e:
             print(f"表格转PDF错误: {e}")
             return False
 
-    def _pdf_to_markdown(self, source_path: str, output_path: str) -> bool:
+    def _spreadsheet_flowables(self, source_path: str, source_ext: str, token: Optional[ProgressToken] = None):
+        """
+        分块读取表格数据，惰性生成标题和若干张带重复表头的表格
+
+        单元格按原始文本输出，不做类型推断，避免各数据块推断结果不一致
+        """
+        context = get_render_context()
+        title_text = "数据表格"
+        yield Paragraph(title_text, context.paragraph_style('Title', title_text))
+        yield Spacer(1, 12)
+        
+        if token is not None:
+            token.start(None, 'row')
+        for data in self._iter_spreadsheet_chunks(source_path, source_ext, SPREADSHEET_ROWS_PER_TABLE):
+            if token is not None:
+                token.advance(len(data) - 1)
+            t = Table(data, repeatRows=1)
+            t.setStyle(context.spreadsheet_table_style)
+            context.apply_cjk_font(t, data)
+            yield t
+
+    @staticmethod
+    def _iter_spreadsheet_chunks(source_path: str, source_ext: str, rows_per_chunk: int):
+        """
+        分块读取表格，每块为 [表头] + 最多 rows_per_chunk 行的字符串列表
+        """
+        if source_ext == '.csv':
+            reader = pd.read_csv(source_path, encoding='utf-8', dtype=str,
+                                 keep_default_na=False, chunksize=rows_per_chunk)
+            for chunk in reader:
+                yield [chunk.columns.tolist()] + chunk.values.tolist()
+            return
+            
+        if source_ext == '.xls':
+            # 旧版 Excel 没有流式读取接口
+            df = pd.read_excel(source_path, dtype=str, keep_default_na=False)
+            header = df.columns.tolist()
+            for start in range(0, len(df), rows_per_chunk):
+                yield [header] + df.iloc[start:start + rows_per_chunk].values.tolist()
+            return
+            
+        import openpyxl
+        # 以文件对象打开：openpyxl 按路径打开时会拒绝扩展名不是 .xlsx 的文件
+        with open(source_path, 'rb') as file:
+            workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+            try:
+                rows = workbook.worksheets[0].iter_rows(values_only=True)
+                header = [str(cell) if cell is not None else '' for cell in next(rows, ())]
+                chunk = []
+                for row in rows:
+                    chunk.append([str(cell) if cell is not None else '' for cell in row])
+                    if len(chunk) >= rows_per_chunk:
+                        yield [header] + chunk
+                        chunk = []
+                if chunk:
+                    yield [header] + chunk
+            finally:
+                workbook.close()
+
+    def _pdf_to_markdown(self, source_path: str, output_path: str, token: Optional[ProgressToken] = None,
+                         checkpoint_path: Optional[str] = None) -> bool:
         """
         PDF转Markdown
         """
         try:
             markdown_content = []
             
-            with open(source_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                
-                for page_num in range(len(pdf_reader.pages)):
-                    page = pdf_reader.pages[page_num]
-                    text = page.extract_text()
+            for page_num, page_count, text in self._extract_pdf_pages(source_path, token, checkpoint_path):
+                if text.strip():
+                    # 处理文本，转换为Markdown格式
+                    processed_text = self._process_text_to_markdown(text)
+                    markdown_content.append(processed_text)
                     
-                    if text.strip():
-                        # 处理文本，转换为Markdown格式
-                        processed_text = self._process_text_to_markdown(text)
-                        markdown_content.append(processed_text)
+                    # 添加分页符（除了最后一页）
+                    if page_num < page_count - 1:
+                        markdown_content.append("\n\n---\n\n")
                         
-                        # 添加分页符（除了最后一页）
-                        if page_num < len(pdf_reader.pages) - 1:
-                            markdown_content.append("\n\n---\n\n")
-                            
             # 写入Markdown文件，使用不同平台的编码方式
             import platform
             if platform.system() == 'Windows':
@@ -440,7 +1705,10 @@ class FileConverter:
         if not source_path or not os.path.exists(source_path):
             return []
             
-        source_ext = os.path.splitext(source_path)[1].lower()
+        try:
+            source_ext = self._source_format(source_path)
+        except (OSError, ValueError):
+            return []
         
         # 定义转换规则
         conversion_rules = {
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+现代文件转换器 - 字体管理模块
+
+Copyright 2024 现代文件转换器项目
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import os
+import re
+import threading
+from typing import List, Optional, Tuple
+
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.cidfonts import UnicodeCIDFont
+from reportlab.pdfbase.ttfonts import TTFont
+
+
+# 注册到 reportlab 中的CJK字体名
+CJK_FONT_NAME = 'FTR-CJK'
+
+# 找不到可用的 TrueType 字体时使用的内置CID字体（不嵌入，由阅读器提供字形）
+CJK_FALLBACK_FONT = 'STSong-Light'
+
+# 环境变量：指定CJK字体文件，可用 "路径@子字体序号" 选择 TTC 中的字体，多个路径用 os.pathsep 分隔
+CJK_FONT_ENV = 'FTR_CJK_FONT'
+
+# 各平台常见的CJK TrueType 字体 (路径, TTC子字体序号)
+CJK_FONT_CANDIDATES = [
+    # Windows
+    ('C:/Windows/Fonts/msyh.ttc', 0),
+    ('C:/Windows/Fonts/simhei.ttf', 0),
+    ('C:/Windows/Fonts/simsun.ttc', 0),
+    # macOS
+    ('/System/Library/Fonts/STHeiti Light.ttc', 0),
+    ('/System/Library/Fonts/Hiragino Sans GB.ttc', 0),
+    ('/Library/Fonts/Arial Unicode.ttf', 0),
+    # Linux
+    ('/usr/share/fonts/truetype/wqy/wqy-microhei.ttc', 0),
+    ('/usr/share/fonts/truetype/wqy/wqy-zenhei.ttc', 0),
+    ('/usr/share/fonts/truetype/droid/DroidSansFallbackFull.ttf', 0),
+    ('/usr/share/fonts/truetype/arphic/uming.ttc', 0),
+]
+
+_CJK_PATTERN = re.compile('[\u2e80-\u9fff\uac00-\ud7af\uf900-\ufaff\u3000-\u303f\uff00-\uffef]')
+
+_configured_fonts: Optional[List[Tuple[str, int]]] = None
+_registered_font: Optional[str] = None
+_lock = threading.Lock()
+
+
+def contains_cjk(text: str) -> bool:
+    """
+    判断文本中是否含有中日韩字符
+    """
+    return bool(text) and _CJK_PATTERN.search(text) is not None
+
+
+def configure_cjk_fonts(fonts: List[Tuple[str, int]]):
+    """
+    指定候选CJK字体列表（优先于环境变量和内置候选），需在首次渲染前调用
+    """
+    global _configured_fonts
+    with _lock:
+        _configured_fonts = list(fonts)
+
+
+def _candidate_fonts() -> List[Tuple[str, int]]:
+    """
+    按优先级返回候选字体：显式配置 > 环境变量 > 平台默认
+    """
+    if _configured_fonts is not None:
+        return list(_configured_fonts)
+    candidates = []
+    for entry in filter(None, os.environ.get(CJK_FONT_ENV, '').split(os.pathsep)):
+        path, _, index = entry.partition('@')
+        candidates.append((path, int(index) if index.isdigit() else 0))
+    return candidates + CJK_FONT_CANDIDATES
+
+
+def get_cjk_font() -> str:
+    """
+    返回可用的CJK字体名，每个进程只注册一次
+
+    TrueType 字体只解析一次并缓存在 reportlab 的字体注册表中；
+    生成PDF时 reportlab 只嵌入实际用到的字形子集，因此文件大小与字体文件大小无关。
+    找不到可用字体时退回内置的CID字体。
+    """
+    global _registered_font
+    if _registered_font is not None:
+        return _registered_font
+    with _lock:
+        if _registered_font is not None:
+            return _registered_font
+        for path, index in _candidate_fonts():
+            if not os.path.exists(path):
+                continue
+            try:
+                pdfmetrics.registerFont(TTFont(CJK_FONT_NAME, path, subfontIndex=index))
+                _registered_font = CJK_FONT_NAME
+                return _registered_font
+            except Exception as e:
+                # 例如 PostScript 轮廓的 OTF/TTC，reportlab 无法嵌入
+                print(f"字体加载失败 {path}: {e}")
+        pdfmetrics.registerFont(UnicodeCIDFont(CJK_FALLBACK_FONT))
+        _registered_font = CJK_FALLBACK_FONT
+        return _registered_font
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+现代文件转换器 - 文件格式识别模块
+
+Copyright 2024 现代文件转换器项目
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import os
+import threading
+import zipfile
+from collections import OrderedDict
+from typing import Optional
+
+
+# 识别时读取的文件头字节数
+SNIFF_BYTES = 8192
+
+# OLE2 复合文档的目录项可能不在文件开头，最多读取的字节数
+OLE_SNIFF_BYTES = 64 * 1024
+
+# 缓存的识别结果条数
+SNIFF_CACHE_SIZE = 4096
+
+# 可按扩展名区分的文本格式，其他文本内容识别为 .txt
+TEXT_FORMATS = ('.csv', '.md')
+
+_OLE_MAGIC = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'
+
+_IMAGE_MAGIC = (
+    (b'\x89PNG\r\n\x1a\n', '.png'),
+    (b'\xff\xd8\xff', '.jpg'),
+    (b'GIF87a', '.gif'),
+    (b'GIF89a', '.gif'),
+    (b'II*\x00', '.tiff'),
+    (b'MM\x00*', '.tiff'),
+)
+
+# BMP 信息头 (DIB header) 的合法长度：OS/2 1.x、BITMAPINFOHEADER 及其扩展、V4、V5
+_BMP_DIB_SIZES = (12, 40, 52, 56, 108, 124)
+
+# PDF 规范允许 %PDF- 前有少量垃圾字节，最多查找的范围
+_PDF_MAGIC_WINDOW = 1024
+
+# 规范扩展名：同一格式的不同写法
+_CANONICAL_EXT = {'.jpeg': '.jpg', '.tif': '.tiff'}
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def canonical_ext(ext: str) -> str:
+    ext = ext.lower()
+    return _CANONICAL_EXT.get(ext, ext)
+
+
+def _zip_format(source_path: str) -> str:
+    """
+    按 zip 目录中的部件区分 Office Open XML 格式
+    """
+    try:
+        with zipfile.ZipFile(source_path) as package:
+            names = set(package.namelist())
+    except (zipfile.BadZipFile, OSError):
+        return '.zip'
+    if 'word/document.xml' in names:
+        return '.docx'
+    if 'xl/workbook.xml' in names:
+        return '.xlsx'
+    return '.zip'
+
+
+def _ole_format(source_path: str, ext: str) -> str:
+    """
+    按目录项名称（UTF-16）区分 OLE2 复合文档：Excel 为 Workbook/Book，Word 为 WordDocument
+    """
+    with open(source_path, 'rb') as file:
+        head = file.read(OLE_SNIFF_BYTES)
+    if 'Workbook'.encode('utf-16-le') in head or 'Book'.encode('utf-16-le') in head:
+        return '.xls'
+    if 'WordDocument'.encode('utf-16-le') in head:
+        return '.doc'
+    # 目录项不在文件开头时，相信扩展名
+    return '.xls' if ext == '.xls' else '.ole'
+
+
+def _is_text(head: bytes) -> bool:
+    if head.startswith((b'\xff\xfe', b'\xfe\xff')):
+        return True
+    if b'\x00' in head:
+        return False
+    for encoding in ('utf-8', 'gbk'):
+        # 文件头可能截断在多字节字符中间
+        for trim in range(4):
+            try:
+                head[:len(head) - trim].decode(encoding)
+                return True
+            except UnicodeDecodeError:
+                continue
+    return False
+
+
+def _is_bmp(head: bytes, file_size: Optional[int]) -> bool:
+    """
+    校验 BMP 文件头：bfSize 与文件大小一致，信息头长度为已知的取值之一
+
+    只看 "BM" 两个字节时，以 BM 开头的文本（如 "BMI,weight" 表头）会被误认
+    """
+    if not head.startswith(b'BM') or len(head) < 18:
+        return False
+    if file_size is not None and int.from_bytes(head[2:6], 'little') != file_size:
+        return False
+    return int.from_bytes(head[14:18], 'little') in _BMP_DIB_SIZES
+
+
+def _is_pdf_after_junk(head: bytes) -> bool:
+    """
+    %PDF- 前面是非文本的垃圾字节（PDF 规范允许）
+
+    正文中提到 "%PDF-1.7" 的文本文件不算
+    """
+    pos = head.find(b'%PDF-', 0, _PDF_MAGIC_WINDOW)
+    return pos > 0 and not _is_text(head[:pos])
+
+
+def sniff_bytes(head: bytes, source_path: str = '', file_size: Optional[int] = None) -> Optional[str]:
+    """
+    按文件头识别格式，返回规范扩展名（如 '.png'、'.xlsx'），无法识别的二进制内容返回 None
+
+    source_path 用于 zip/OLE2 容器的进一步区分，以及文本格式按扩展名细分；
+    file_size 用于校验 BMP 文件头，未指定时按 source_path 读取。
+    扩展名为文本格式且内容是文本时，BMP、前有垃圾字节的 %PDF- 这类较弱的特征不改变识别结果。
+    """
+    ext = canonical_ext(os.path.splitext(source_path)[1])
+    for magic, fmt in _IMAGE_MAGIC:
+        if head.startswith(magic):
+            return fmt
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return '.webp'
+    if head.startswith(b'PK\x03\x04'):
+        return _zip_format(source_path) if source_path else '.zip'
+    if head.startswith(_OLE_MAGIC):
+        return _ole_format(source_path, ext) if source_path else '.ole'
+    if head.startswith(b'%PDF-'):
+        return '.pdf'
+    text = not head or _is_text(head)
+    if text and ext in TEXT_FORMATS + ('.txt',):
+        return ext
+    if file_size is None and source_path:
+        try:
+            file_size = os.path.getsize(source_path)
+        except OSError:
+            pass
+    if _is_bmp(head, file_size):
+        return '.bmp'
+    if _is_pdf_after_junk(head):
+        return '.pdf'
+    if text:
+        return ext if ext in TEXT_FORMATS else '.txt'
+    return None
+
+
+def sniff_format(source_path: str) -> Optional[str]:
+    """
+    读取文件头识别实际格式，结果按 (路径, 修改时间, 大小) 缓存
+
+    文件不存在时抛出 OSError
+    """
+    stat = os.stat(source_path)
+    key = os.path.abspath(source_path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached is not None and cached[0] == signature:
+            _cache.move_to_end(key)
+            return cached[1]
+
+    with open(source_path, 'rb') as file:
+        head = file.read(SNIFF_BYTES)
+    fmt = sniff_bytes(head, source_path, stat.st_size)
+
+    with _cache_lock:
+        _cache[key] = (signature, fmt)
+        _cache.move_to_end(key)
+        while len(_cache) > SNIFF_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return fmt
@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+现代文件转换器 - 批量图像转换模块
+
+Copyright 2024 现代文件转换器项目
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from concurrent.futures import Executor, ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from atomic_output import atomic_output
+
+
+# 需要去除透明通道的目标格式
+FLATTEN_FORMATS = ('JPG', 'JPEG')
+
+# 向量化合成时每次处理的像素数，限制临时数组的大小
+FLATTEN_CHUNK_PIXELS = 4 * 1024 * 1024
+
+
+def flatten_alpha(pixels: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    向量化地将 RGBA 像素合成到白色背景上
+
+    pixels 的形状为 (..., 4)，可以是 (N, H, W, 4) 的多图堆叠，一次处理整批图像
+    """
+    if out is None:
+        out = np.empty(pixels.shape[:-1] + (3,), dtype=np.uint8)
+    src = pixels.reshape(-1, 4)
+    dst = out.reshape(-1, 3)
+    for start in range(0, src.shape[0], FLATTEN_CHUNK_PIXELS):
+        chunk = src[start:start + FLATTEN_CHUNK_PIXELS]
+        alpha = chunk[:, 3:4].astype(np.uint16)
+        rgb = chunk[:, :3].astype(np.uint16)
+        # out = (rgb * a + 255 * (255 - a)) / 255，四舍五入
+        blended = rgb * alpha + 255 * (255 - alpha) + 127
+        dst[start:start + FLATTEN_CHUNK_PIXELS] = blended // 255
+    return out
+
+
+class SharedPixelBlock:
+    """
+    保存在共享内存中的一组同尺寸、同模式的像素
+
+    工作进程按名称挂载同一块内存，像素数据不经过 pickle 复制
+    """
+
+    def __init__(self, shape: Tuple[int, ...], name: Optional[str] = None):
+        nbytes = int(np.prod(shape))
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=max(1, nbytes))
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.shape = tuple(shape)
+        self.array = np.ndarray(self.shape, dtype=np.uint8, buffer=self.shm.buf)
+
+    @property
+    def descriptor(self) -> Tuple[str, Tuple[int, ...]]:
+        """
+        可在进程间传递的描述信息
+        """
+        return self.shm.name, self.shape
+
+    @classmethod
+    def attach(cls, descriptor: Tuple[str, Tuple[int, ...]]) -> 'SharedPixelBlock':
+        """
+        在工作进程中挂载已存在的共享内存
+        """
+        name, shape = descriptor
+        return cls(shape, name=name)
+
+    def image(self, index: int, mode: str) -> Image.Image:
+        """
+        以零拷贝方式把第 index 张图像包装为 PIL 图像
+        """
+        height, width = self.shape[1:3]
+        return Image.frombuffer(mode, (width, height), self.array[index], 'raw', mode, 0, 1)
+
+    def close(self):
+        self.array = None
+        self.shm.close()
+
+    def unlink(self):
+        self.close()
+        self.shm.unlink()
+
+
+def _raw_mode(img: Image.Image) -> str:
+    """
+    选择放入共享内存的像素模式
+    """
+    if img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info):
+        return 'RGBA'
+    if img.mode in ('1', 'L'):
+        return 'L'
+    return 'RGB'
+
+
+def _encode_shared(descriptor: Tuple[str, Tuple[int, ...]], index: int, mode: str,
+                   output_path: str, target_format: str) -> bool:
+    """
+    工作进程：从共享内存读取像素并编码输出
+    """
+    block = None
+    try:
+        block = SharedPixelBlock.attach(descriptor)
+        img = block.image(index, mode)
+        format_name = target_format.upper()
+        if format_name == 'JPG':
+            format_name = 'JPEG'
+        with atomic_output(output_path) as temp_path:
+            img.save(temp_path, format=format_name)
+        return True
+    except Exception as e:
+        print(f"图像转换错误: {e}")
+        return False
+    finally:
+        if block is not None:
+            img = None
+            block.close()
+
+
+def _convert_path(source_path: str, output_path: str, target_format: str) -> bool:
+    """
+    工作进程：不经过共享内存的普通转换（如 PDF 输出）
+    """
+    from file_converter import FileConverter
+    return bool(FileConverter().convert(source_path, output_path, target_format))
+
+
+def _decode_chunk(sources: List[str], headers: dict) -> Tuple[dict, dict]:
+    """
+    解码一组源图像，按 (模式, 尺寸) 分组写入共享内存
+
+    headers 为 {源路径: (像素模式, 尺寸)}（规划批次时从文件头读取），据此先分配共享内存；
+    每张图像解码后立即复制进共享内存并释放，同一时刻只保留一张解码后的图像。
+    返回 {源路径: (分组键, 序号)} 和 {分组键: SharedPixelBlock}
+    """
+    from file_converter import FileConverter
+    groups = {}
+    for source_path in sources:
+        groups.setdefault(headers[source_path], []).append(source_path)
+
+    slots = {}
+    blocks = {}
+    try:
+        for key, paths in groups.items():
+            mode, (width, height) = key
+            channels = len(mode)
+            shape = (len(paths), height, width, channels) if channels > 1 else (len(paths), height, width)
+            blocks[key] = SharedPixelBlock(shape)
+            for index, source_path in enumerate(paths):
+                try:
+                    with FileConverter._open_image(source_path) as img:
+                        decoded = img.convert(mode) if img.mode != mode else img
+                        blocks[key].array[index] = np.asarray(decoded)
+                    # 立即释放解码结果，再解码下一张
+                    decoded = None
+                    slots[source_path] = (key, index)
+                except Exception as e:
+                    print(f"图像转换错误: {e}")
+    except Exception:
+        for block in blocks.values():
+            block.unlink()
+        raise
+    return slots, blocks
+
+
+def convert_images_batch(jobs: List[Tuple[str, str, str]], max_workers: Optional[int] = None,
+                         executor: Optional[Executor] = None,
+                         memory_budget_mb: Optional[int] = None) -> List[bool]:
+    """
+    批量图像转换
+
+    jobs 为 (源路径, 输出路径, 目标格式) 列表。同一源文件只解码一次，
+    像素经共享内存交给工作进程编码；需要去除透明通道的图像按尺寸分组后
+    一次性向量化合成。返回与 jobs 顺序一致的结果列表。
+    """
+    results = [False] * len(jobs)
+    if not jobs:
+        return results
+
+    own_executor = executor is None
+    if own_executor:
+        executor = ProcessPoolExecutor(max_workers=max_workers)
+
+    try:
+        from file_converter import FileConverter
+
+        # 按源文件归并任务，并按内存预算切分成多个解码批次
+        by_source = {}
+        for job_index, (source_path, output_path, target_format) in enumerate(jobs):
+            by_source.setdefault(source_path, []).append(job_index)
+
+        budget = (memory_budget_mb or 0) * 1024 * 1024
+        headers = {}
+        chunks, current, resident, transient = [], [], 0, 0
+        for source_path, job_indexes in by_source.items():
+            if all(jobs[i][2].upper() == 'PDF' for i in job_indexes):
+                # 只输出PDF的源文件由工作进程按单张转换处理（自带预算检查），不在此解码
+                current.append(source_path)
+                continue
+            try:
+                with FileConverter._open_image(source_path) as img:
+                    mode = _raw_mode(img)
+                    flatten = mode == 'RGBA' and any(jobs[i][2].upper() in FLATTEN_FORMATS for i in job_indexes)
+                    pixels = img.size[0] * img.size[1]
+                    # 与单张转换相同的按模式估算：解码后的图像（多通道每像素4字节）
+                    # + 转换模式时的副本，两者只在解码这一张时存在
+                    decode_bytes = FileConverter._estimate_image_bytes(
+                        img, extra_bpp=(1 if mode == 'L' else 4) if img.mode != mode else 0)
+                    headers[source_path] = (mode, img.size)
+                # 共享内存中的像素 + 可能的合成结果，整个批次期间都存在
+                shared_bytes = pixels * (len(mode) + (3 if flatten else 0))
+                FileConverter._check_memory_budget(source_path, decode_bytes + shared_bytes, memory_budget_mb)
+            except Exception as e:
+                # 无法解码的源文件只跳过其栅格输出，PDF输出仍交给工作进程
+                print(f"图像转换错误: {e}")
+                headers.pop(source_path, None)
+                current.append(source_path)
+                continue
+            if current and budget and resident + shared_bytes + max(transient, decode_bytes) > budget:
+                chunks.append(current)
+                current, resident, transient = [], 0, 0
+            current.append(source_path)
+            resident += shared_bytes
+            transient = max(transient, decode_bytes)
+        if current:
+            chunks.append(current)
+
+        for sources in chunks:
+            _run_chunk(sources, headers, by_source, jobs, results, executor)
+    finally:
+        if own_executor:
+            executor.shutdown()
+
+    return results
+
+
+def _run_chunk(sources: List[str], headers: dict, by_source: dict, jobs: list, results: list,
+               executor: Executor):
+    """
+    解码一个批次并把编码任务分发给工作进程
+    """
+    raster_sources = [source_path for source_path in sources if source_path in headers]
+    futures = []
+    blocks = {}
+    flattened = {}
+    try:
+        slots, blocks = _decode_chunk(raster_sources, headers)
+
+        # 对需要去除透明通道的分组进行整组向量化合成
+        for key, block in blocks.items():
+            mode = key[0]
+            needs_flatten = mode == 'RGBA' and any(
+                jobs[i][2].upper() in FLATTEN_FORMATS
+                for source_path, (slot_key, _) in slots.items() if slot_key == key
+                for i in by_source[source_path]
+            )
+            if needs_flatten:
+                rgb_block = SharedPixelBlock(block.shape[:3] + (3,))
+                flatten_alpha(block.array, out=rgb_block.array)
+                flattened[key] = rgb_block
+
+        for source_path in sources:
+            for job_index in by_source[source_path]:
+                _, output_path, target_format = jobs[job_index]
+                if target_format.upper() == 'PDF':
+                    future = executor.submit(_convert_path, source_path, output_path, target_format)
+                elif source_path not in slots:
+                    continue
+                else:
+                    key, index = slots[source_path]
+                    block, mode = blocks[key], key[0]
+                    if target_format.upper() in FLATTEN_FORMATS and key in flattened:
+                        block, mode = flattened[key], 'RGB'
+                    future = executor.submit(_encode_shared, block.descriptor, index, mode,
+                                             output_path, target_format)
+                futures.append((job_index, future))
+
+        for job_index, future in futures:
+            try:
+                results[job_index] = future.result()
+            except Exception as e:
+                print(f"图像转换错误: {e}")
+                results[job_index] = False
+        futures = []
+    except Exception as e:
+        print(f"图像转换错误: {e}")
+    finally:
+        for _, future in futures:
+            future.cancel()
+        for block in list(blocks.values()) + list(flattened.values()):
+            block.unlink()
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+现代文件转换器 - 图像感知哈希去重模块
+
+Copyright 2024 现代文件转换器项目
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import os
+import shutil
+from typing import Callable, Dict, List, Optional, Tuple
+
+from PIL import Image
+
+
+# 默认的汉明距离阈值（64位哈希中允许不同的位数）
+DEFAULT_HASH_THRESHOLD = 4
+
+# 确认重复时 RGB 缩略图逐像素、逐通道的平均差异上限（0-255）
+DEFAULT_MAX_COLOR_DIFF = 6
+
+# dHash 的网格尺寸，生成 8x8=64 位哈希
+_HASH_SIZE = 8
+
+# 确认重复时比较的 RGB 缩略图边长
+_THUMB_SIZE = 16
+
+# 置位（或清零）少于该值的哈希信息量太少（纯色、平坦或只有单一渐变的图像），不参与去重
+_MIN_HASH_BITS = 4
+
+
+def image_fingerprint(source_path: str) -> Tuple[int, Tuple[int, int], bytes]:
+    """
+    计算图像的去重指纹，返回 (64位 dHash, 原始尺寸, RGB缩略图字节)
+
+    dHash 只反映灰度梯度，颜色不同的图像也可能相同，因此另取一张小 RGB 缩略图
+    （透明区域与转换时一样合成到白色背景上）用于逐一确认。
+    JPEG 通过草稿模式直接按比例缩小解码，只需读取极少的像素。
+    与转换时相同，打开时不做 Pillow 的解压炸弹检查，大幅扫描件也能参与去重。
+    """
+    from file_converter import FileConverter
+    with FileConverter._open_image(source_path) as img:
+        size = img.size
+        img.draft('RGB', (_THUMB_SIZE * 8, _THUMB_SIZE * 8))
+        has_alpha = img.mode in ('RGBA', 'LA', 'PA') or 'transparency' in img.info
+        mode = 'RGBA' if has_alpha else 'RGB'
+        small = img if img.mode == mode else img.convert(mode)
+        factor = min(small.size) // (_THUMB_SIZE * 4)
+        if factor > 1:
+            small = small.reduce(factor)
+        if has_alpha:
+            background = Image.new('RGB', small.size, (255, 255, 255))
+            background.paste(small, (0, 0), small)
+            small = background
+        thumbnail = small.resize((_THUMB_SIZE, _THUMB_SIZE), Image.Resampling.BOX).tobytes()
+        values = list(small.convert('L').resize((_HASH_SIZE + 1, _HASH_SIZE), Image.Resampling.BOX).getdata())
+    bits = 0
+    for row in range(_HASH_SIZE):
+        offset = row * (_HASH_SIZE + 1)
+        for col in range(_HASH_SIZE):
+            bits = (bits << 1) | (values[offset + col] < values[offset + col + 1])
+    return bits, size, thumbnail
+
+
+def _low_information(value: int) -> bool:
+    ones = bin(value).count('1')
+    return ones < _MIN_HASH_BITS or _HASH_SIZE * _HASH_SIZE - ones < _MIN_HASH_BITS
+
+
+def thumbnails_match(first: bytes, second: bytes, max_color_diff: int = DEFAULT_MAX_COLOR_DIFF) -> bool:
+    """
+    两张同尺寸 RGB 缩略图的平均通道差异是否不超过 max_color_diff
+    """
+    if len(first) != len(second):
+        return False
+    return sum(abs(a - b) for a, b in zip(first, second)) <= max_color_diff * len(first)
+
+
+def group_duplicates(hashes: List[int], threshold: int = DEFAULT_HASH_THRESHOLD,
+                     same: Optional[Callable[[int, int], bool]] = None) -> List[List[int]]:
+    """
+    按汉明距离对哈希分组，返回下标分组列表，每组第一个下标为代表
+
+    每个哈希只与已有分组的代表直接比较，不经其他成员传递（A 近似 B、B 近似 C
+    不会让相距超过阈值的 A 和 C 同组）；same(代表下标, 下标) 可对候选做进一步确认。
+    信息量过少的哈希（如全 0、全 1）各自单独成组。
+    把64位哈希切成 threshold+1 段，距离不超过阈值的两个哈希至少有一段完全相同
+    （鸽巢原理），因此只需比较同段相同的代表，避免两两比较。
+    """
+    segments = min(64, threshold + 1)
+    bounds = [64 * k // segments for k in range(segments + 1)]
+    buckets = {}
+    groups = []
+    for index, value in enumerate(hashes):
+        if _low_information(value):
+            groups.append([index])
+            continue
+        keys = [(k, (value >> bounds[k]) & ((1 << (bounds[k + 1] - bounds[k])) - 1))
+                for k in range(segments)]
+        match = None
+        for group_id in sorted({group_id for key in keys for group_id in buckets.get(key, ())}):
+            representative = groups[group_id][0]
+            if bin(value ^ hashes[representative]).count('1') <= threshold \
+                    and (same is None or same(representative, index)):
+                match = group_id
+                break
+        if match is not None:
+            groups[match].append(index)
+            continue
+        groups.append([index])
+        for key in keys:
+            buckets.setdefault(key, []).append(len(groups) - 1)
+    return groups
+
+
+def plan_dedup(jobs: List[Tuple[str, str, str]], threshold: int = DEFAULT_HASH_THRESHOLD,
+               max_color_diff: int = DEFAULT_MAX_COLOR_DIFF) -> Tuple[List[int], Dict[int, int]]:
+    """
+    为批量图像任务制定去重计划
+
+    jobs 为 (源路径, 输出路径, 目标格式) 列表。目标格式相同、源图像尺寸完全相同、
+    哈希相近且缩略图颜色一致的任务只转换组内第一个（代表），其余直接与代表比较确认。
+    返回 (需要实际转换的任务下标, {重复任务下标: 代表任务下标})。
+    无法计算指纹的源文件照常转换。
+    """
+    fingerprints = {}
+    for source_path, _, _ in jobs:
+        if source_path in fingerprints:
+            continue
+        try:
+            fingerprints[source_path] = image_fingerprint(source_path)
+        except Exception as e:
+            print(f"图像哈希错误: {e}")
+            fingerprints[source_path] = None
+
+    aliases = {}
+    first_job = {}
+    sources_by_format = {}
+    for job_index, (source_path, _, target_format) in enumerate(jobs):
+        key = (source_path, target_format.upper())
+        if key in first_job:
+            # 同一源文件、同一格式的重复任务
+            aliases[job_index] = first_job[key]
+            continue
+        first_job[key] = job_index
+        if fingerprints[source_path] is not None:
+            sources_by_format.setdefault(key[1], []).append(source_path)
+
+    for target_format, sources in sources_by_format.items():
+        prints = [fingerprints[source_path] for source_path in sources]
+
+        def same(representative, index):
+            return prints[representative][1] == prints[index][1] \
+                and thumbnails_match(prints[representative][2], prints[index][2], max_color_diff)
+
+        for members in group_duplicates([value for value, _, _ in prints], threshold, same):
+            representative = first_job[(sources[members[0]], target_format)]
+            for member in members[1:]:
+                aliases[first_job[(sources[member], target_format)]] = representative
+
+    to_run = [job_index for job_index in range(len(jobs)) if job_index not in aliases]
+    return to_run, aliases
+
+
+def link_output(existing_path: str, output_path: str, hardlink: bool = True):
+    """
+    让重复任务的输出指向代表任务的输出
+
+    优先使用硬链接，不支持时（如跨设备）退回到复制
+    """
+    if os.path.abspath(existing_path) == os.path.abspath(output_path):
+        return
+    if os.path.exists(output_path):
+        os.remove(output_path)
+    if hardlink:
+        try:
+            os.link(existing_path, output_path)
+            return
+        except OSError:
+            pass
+    shutil.copy2(existing_path, output_path)
@@ -2,7 +2,7 @@ import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 import os
 import threading
-from file_converter import FileConverter
+from file_converter import FileConverter, ProgressToken
 
 
 class FileConverterGUI:
@@ -13,6 +13,7 @@ class FileConverterGUI:
         self.root.resizable(True, True)
         
         self.converter = FileConverter()
+        self.token = None
         self.setup_ui()
         
     def setup_ui(self):
@@ -49,6 +50,10 @@ class FileConverterGUI:
         self.convert_btn = ttk.Button(main_frame, text="开始转换", command=self.start_conversion)
         self.convert_btn.grid(row=3, column=1, pady=20)
         
+        # 取消按钮
+        self.cancel_btn = ttk.Button(main_frame, text="取消", command=self.cancel_conversion, state='disabled')
+        self.cancel_btn.grid(row=3, column=2, pady=20)
+        
         # 进度条
         self.progress = ttk.Progressbar(main_frame, mode='indeterminate')
         self.progress.grid(row=4, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=10)
@@ -148,7 +153,10 @@ class FileConverterGUI:
             return
             
         # 在新线程中执行转换
+        self.token = ProgressToken(on_progress=self.on_progress)
         self.convert_btn.config(state='disabled')
+        self.cancel_btn.config(state='normal')
+        self.progress.config(mode='indeterminate')
         self.progress.start()
         self.status_label.config(text="转换中...")
         self.log_message(f"开始转换: {os.path.basename(self.source_path.get())}")
@@ -157,15 +165,38 @@ class FileConverterGUI:
         thread.daemon = True
         thread.start()
         
+    def cancel_conversion(self):
+        if self.token is not None:
+            self.token.cancel()
+            self.cancel_btn.config(state='disabled')
+            self.status_label.config(text="正在取消...")
+            
+    def on_progress(self, done, total, unit):
+        # 在转换线程中调用，界面更新交给主线程
+        self.root.after(0, self.update_progress, done, total, unit)
+        
+    def update_progress(self, done, total, unit):
+        unit_name = {'page': '页', 'row': '行', 'block': '段'}.get(unit, '')
+        if total:
+            self.progress.stop()
+            self.progress.config(mode='determinate', maximum=total, value=done)
+            self.status_label.config(text=f"转换中... {done}/{total} {unit_name}")
+        else:
+            self.status_label.config(text=f"转换中... 已处理 {done} {unit_name}")
+            
     def convert_file(self):
         try:
             success = self.converter.convert(
                 self.source_path.get(),
                 self.output_path.get(),
-                self.target_format.get()
+                self.target_format.get(),
+                token=self.token
             )
             
-            if success:
+            if success.status == 'cancelled':
+                self.log_message("转换已取消")
+                self.root.after(0, lambda: self.status_label.config(text="已取消"))
+            elif success:
                 self.log_message("转换成功!")
                 self.root.after(0, lambda: messagebox.showinfo("成功", "文件转换完成!"))
                 self.root.after(0, lambda: self.status_label.config(text="转换完成"))
@@ -185,7 +216,10 @@ class FileConverterGUI:
             
     def conversion_finished(self):
         self.progress.stop()
+        self.progress.config(mode='indeterminate', value=0)
         self.convert_btn.config(state='normal')
+        self.cancel_btn.config(state='disabled')
+        self.token = None
 
 
 def main():
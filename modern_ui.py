@@ -22,7 +22,7 @@ import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 import os
 import threading
-from file_converter import FileConverter
+from file_converter import FileConverter, ProgressToken
 from datetime import datetime
 
 class ModernFileConverterGUI:
@@ -47,6 +47,7 @@ class ModernFileConverterGUI:
         }
         
         self.converter = FileConverter()
+        self.token = None
         self.setup_modern_ui()
         
         # 设置样式
@@ -250,7 +251,23 @@ class ModernFileConverterGUI:
                                     padx=40,
                                     pady=15,
                                     cursor='hand2')
-        self.convert_btn.pack(pady=30)
+        self.convert_btn.pack(pady=(30, 10))
+        
+        # 取消按钮（转换进行中才可用）
+        self.cancel_btn = tk.Button(container,
+                                   text="⏹ 取消转换",
+                                   command=self.cancel_conversion,
+                                   font=('Helvetica', 11, 'bold'),
+                                   bg=self.colors['danger'],
+                                   fg=self.colors['white'],
+                                   activebackground='#dc2626',
+                                   activeforeground=self.colors['white'],
+                                   relief='flat',
+                                   padx=25,
+                                   pady=8,
+                                   cursor='hand2',
+                                   state='disabled')
+        self.cancel_btn.pack(pady=(0, 20))
         
         # 进度条
         self.progress = ttk.Progressbar(container, 
@@ -526,7 +543,10 @@ class ModernFileConverterGUI:
             self.output_path.set(output_file)
             
         # 在新线程中执行转换
+        self.token = ProgressToken(on_progress=self.on_progress)
         self.convert_btn.config(state='disabled', text="⏳ 转换中...")
+        self.cancel_btn.config(state='normal')
+        self.progress.config(mode='indeterminate')
         self.progress.start()
         self.status_label.config(text="🔄 正在转换...")
         self.log_message("🚀 开始转换...")
@@ -535,16 +555,41 @@ class ModernFileConverterGUI:
         thread.daemon = True
         thread.start()
         
+    def cancel_conversion(self):
+        """取消转换"""
+        if self.token is not None:
+            self.token.cancel()
+            self.cancel_btn.config(state='disabled')
+            self.status_label.config(text="⏹ 正在取消...")
+            
+    def on_progress(self, done, total, unit):
+        """转换进度回调（在转换线程中调用，界面更新交给主线程）"""
+        self.root.after(0, self.update_progress, done, total, unit)
+        
+    def update_progress(self, done, total, unit):
+        """更新进度条和状态"""
+        unit_name = {'page': '页', 'row': '行', 'block': '段'}.get(unit, '')
+        if total:
+            self.progress.stop()
+            self.progress.config(mode='determinate', maximum=total, value=done)
+            self.status_label.config(text=f"🔄 正在转换... {done}/{total} {unit_name}")
+        else:
+            self.status_label.config(text=f"🔄 正在转换... 已处理 {done} {unit_name}")
+            
     def convert_file(self):
         """转换文件"""
         try:
             success = self.converter.convert(
                 self.source_path.get(),
                 self.output_path.get(),
-                self.target_format.get()
+                self.target_format.get(),
+                token=self.token
             )
             
-            if success:
+            if success.status == 'cancelled':
+                self.log_message("⏹ 转换已取消，已清理不完整的输出")
+                self.root.after(0, lambda: self.status_label.config(text="⏹ 已取消"))
+            elif success:
                 self.log_message("✅ 转换成功完成!")
                 self.log_message(f"📄 输出文件: {os.path.basename(self.output_path.get())}")
                 self.root.after(0, lambda: messagebox.showinfo("成功", "🎉 文件转换完成！"))
@@ -566,7 +611,10 @@ class ModernFileConverterGUI:
     def conversion_finished(self):
         """转换完成"""
         self.progress.stop()
+        self.progress.config(mode='indeterminate', value=0)
         self.convert_btn.config(state='normal', text="🚀 开始转换")
+        self.cancel_btn.config(state='disabled')
+        self.token = None
 
 
 def main():
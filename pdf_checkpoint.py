@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+现代文件转换器 - PDF 分页检查点模块
+
+Copyright 2024 现代文件转换器项目
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import json
+import os
+from typing import List
+
+
+# 检查点文件后缀（位于输出文件旁）
+CHECKPOINT_SUFFIX = '.ckpt'
+
+# 每积累多少页写入一次检查点
+CHECKPOINT_PAGES = 50
+
+# 页数少于该值的PDF不写检查点（重新提取比读写检查点更快）
+CHECKPOINT_MIN_PAGES = 100
+
+_VERSION = 1
+
+
+def checkpoint_path_for(output_path: str) -> str:
+    return output_path + CHECKPOINT_SUFFIX
+
+
+class PageCheckpoint:
+    """
+    长PDF转换的分页检查点（JSON Lines，只追加）
+
+    第一行记录源文件（大小、修改时间）、提取后端和总页数；之后每行是一段连续页面的
+    提取文本 {"start": 起始页, "end": 结束页, "pages": [...]}，写入后立即落盘。
+    重新运行时源文件未变则从最后一段之后继续；中途被终止时最后一行可能不完整，
+    加载时截掉。转换成功后由调用方删除。
+    """
+
+    def __init__(self, path: str, source_path: str, extractor: str, page_count: int):
+        stat = os.stat(source_path)
+        self.path = path
+        self.header = {
+            'version': _VERSION,
+            'source_size': stat.st_size,
+            'source_mtime_ns': stat.st_mtime_ns,
+            'extractor': extractor,
+            'page_count': page_count,
+        }
+        self._file = None
+        self._pending = []
+        self._next_page = 0
+
+    def load(self) -> List[str]:
+        """
+        读取已完成的页面文本（从第 0 页起连续），并打开文件准备追加
+
+        检查点不存在、属于其他源文件或已损坏时重新开始
+        """
+        pages = []
+        valid_bytes = 0
+        try:
+            with open(self.path, 'rb') as file:
+                for index, line in enumerate(file):
+                    try:
+                        record = json.loads(line.decode('utf-8', 'surrogatepass'))
+                    except ValueError:
+                        break
+                    if index == 0:
+                        if record != self.header:
+                            break
+                    elif record.get('start') == len(pages) and isinstance(record.get('pages'), list):
+                        pages.extend(record['pages'])
+                    else:
+                        break
+                    valid_bytes += len(line)
+        except OSError:
+            pass
+
+        if valid_bytes:
+            self._file = open(self.path, 'r+b')
+            # 截掉不完整的最后一行
+            self._file.truncate(valid_bytes)
+            self._file.seek(valid_bytes)
+        else:
+            pages = []
+            self._file = open(self.path, 'wb')
+            self._write(self.header)
+        self._next_page = len(pages)
+        return pages
+
+    def _write(self, record: dict):
+        # 提取的文本中可能有单独的代理项，与文本缓存一样按 surrogatepass 编码
+        self._file.write(json.dumps(record, ensure_ascii=False).encode('utf-8', 'surrogatepass') + b'\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def add(self, page_num: int, text: str):
+        """
+        记录一页的提取结果，积累 CHECKPOINT_PAGES 页后写入一段
+        """
+        if page_num < self._next_page + len(self._pending):
+            return
+        self._pending.append(text)
+        if len(self._pending) >= CHECKPOINT_PAGES:
+            self.flush()
+
+    def flush(self):
+        if not self._pending or self._file is None:
+            return
+        start = self._next_page
+        self._write({'start': start, 'end': start + len(self._pending) - 1, 'pages': self._pending})
+        self._next_page += len(self._pending)
+        self._pending = []
+
+    def close(self):
+        if self._file is None:
+            return
+        try:
+            self.flush()
+        finally:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def remove_checkpoint(output_path: str):
+    """
+    删除输出对应的检查点（转换成功后调用）
+    """
+    try:
+        os.remove(checkpoint_path_for(output_path))
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        print(f"删除检查点失败: {e}")
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+现代文件转换器 - PDF 流式合并模块
+
+Copyright 2024 现代文件转换器项目
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import hashlib
+import io
+from typing import List
+
+import PyPDF2
+from PyPDF2.generic import (
+    ArrayObject,
+    DictionaryObject,
+    IndirectObject,
+    StreamObject,
+)
+
+
+# 合并时按内容去重的共享资源类型（字体、图像等），流对象总是参与去重
+_SHARED_TYPES = {'/Font', '/FontDescriptor', '/ExtGState', '/XObject', '/Pattern', '/Shading', '/Encoding'}
+
+# 目录和页面树使用固定的对象号
+_CATALOG_NUM = 1
+_PAGES_NUM = 2
+
+
+class StreamingPdfMerger:
+    """
+    流式PDF合并器
+
+    按页拷贝输入PDF的对象（内容流保持原始编码，不重新渲染、不提取文本），
+    每个对象拷贝后立即写入输出文件。跨输入内容完全相同的字体、图像等资源只写一次。
+    内存中只保留对象偏移表、页面对象号和资源摘要，不保留页面内容。
+    """
+
+    def __init__(self, output_path: str):
+        self._file = open(output_path, 'wb')
+        self._file.write(b'%PDF-1.7\n%\xe2\xe3\xcf\xd3\n')
+        # 下标为对象号，0 号为空闲链表头
+        self._offsets = [None, None, None]
+        self._kids = []
+        self._shared = {}
+        self._memo = {}
+        self._reserved = {}
+        self._in_progress = set()
+        self.pages_written = 0
+        self.objects_deduplicated = 0
+
+    def _allocate(self) -> int:
+        self._offsets.append(None)
+        return len(self._offsets) - 1
+
+    def _write_object(self, num: int, data: bytes):
+        self._offsets[num] = self._file.tell()
+        self._file.write(f'{num} 0 obj\n'.encode('ascii'))
+        self._file.write(data)
+        self._file.write(b'\nendobj\n')
+
+    def append(self, source_path: str):
+        """
+        追加一个PDF的全部页面
+        """
+        with open(source_path, 'rb') as file:
+            reader = PyPDF2.PdfReader(file, strict=False)
+            if reader.is_encrypted and not reader.decrypt(''):
+                raise ValueError(f"无法合并加密的PDF: {source_path}")
+
+            # 先为所有页面分配对象号，页面之间的互相引用（如链接目标）据此解析
+            pages = list(reader.pages)
+            for page in pages:
+                ref = page.indirect_reference
+                if ref is not None:
+                    self._memo[(ref.idnum, ref.generation)] = self._allocate()
+
+            for page in pages:
+                ref = page.indirect_reference
+                num = self._memo[(ref.idnum, ref.generation)] if ref is not None else self._allocate()
+                self._write_page(num, page)
+
+        # 对象号映射只在单个输入内有效
+        self._memo.clear()
+        self._reserved.clear()
+
+    def _write_page(self, num: int, page: DictionaryObject):
+        buffer = io.BytesIO()
+        buffer.write(b'<<')
+        for key, value in page.items():
+            if key == '/Parent':
+                continue
+            buffer.write(self._serialize(key))
+            buffer.write(b' ')
+            buffer.write(self._serialize(value))
+            buffer.write(b'\n')
+        buffer.write(f'/Parent {_PAGES_NUM} 0 R>>'.encode('ascii'))
+        self._write_object(num, buffer.getvalue())
+        self._kids.append(num)
+        self.pages_written += 1
+
+    def _copy_reference(self, ref: IndirectObject) -> int:
+        """
+        拷贝间接对象并返回它在输出中的对象号
+        """
+        key = (ref.idnum, ref.generation)
+        if key in self._memo:
+            return self._memo[key]
+        if key in self._in_progress:
+            # 循环引用：先预留对象号，该对象不参与去重
+            if key not in self._reserved:
+                self._reserved[key] = self._allocate()
+            return self._reserved[key]
+
+        self._in_progress.add(key)
+        try:
+            obj = ref.get_object()
+            data = self._serialize(obj)
+        finally:
+            self._in_progress.discard(key)
+
+        if key in self._reserved:
+            num = self._reserved.pop(key)
+            self._write_object(num, data)
+        elif self._is_shared(obj):
+            digest = hashlib.sha1(data).digest()
+            num = self._shared.get(digest)
+            if num is None:
+                num = self._allocate()
+                self._write_object(num, data)
+                self._shared[digest] = num
+            else:
+                self.objects_deduplicated += 1
+        else:
+            num = self._allocate()
+            self._write_object(num, data)
+        self._memo[key] = num
+        return num
+
+    @staticmethod
+    def _is_shared(obj) -> bool:
+        if isinstance(obj, StreamObject):
+            return True
+        return isinstance(obj, DictionaryObject) and obj.get('/Type') in _SHARED_TYPES
+
+    @staticmethod
+    def _stream_data(obj: StreamObject) -> bytes:
+        """
+        流对象的原始（仍按 /Filter 编码的）数据，原样复制，不解码再压缩
+        """
+        if not obj.get('/Filter'):
+            return obj.get_data()
+        # 有 /Filter 时 get_data() 返回解码后的数据（图像编码还会被改写），
+        # 改从 write_to_stream 的输出中截取 stream 与 endstream 之间的原始数据
+        buffer = io.BytesIO()
+        obj.write_to_stream(buffer, None)
+        written = buffer.getvalue()
+        return written[written.index(b'\nstream\n') + len(b'\nstream\n'):-len(b'\nendstream')]
+
+    def _serialize(self, obj) -> bytes:
+        """
+        序列化对象，其中的间接引用替换为输出中的对象号
+        """
+        if isinstance(obj, IndirectObject):
+            return f'{self._copy_reference(obj)} 0 R'.encode('ascii')
+        if isinstance(obj, StreamObject):
+            parts = [b'<<']
+            for key, value in obj.items():
+                if key == '/Length':
+                    continue
+                parts.extend((self._serialize(key), b' ', self._serialize(value), b'\n'))
+            data = self._stream_data(obj)
+            parts.append(f'/Length {len(data)}>>\nstream\n'.encode('ascii'))
+            parts.append(data)
+            parts.append(b'\nendstream')
+            return b''.join(parts)
+        if isinstance(obj, DictionaryObject):
+            parts = [b'<<']
+            for key, value in obj.items():
+                parts.extend((self._serialize(key), b' ', self._serialize(value), b'\n'))
+            parts.append(b'>>')
+            return b''.join(parts)
+        if isinstance(obj, ArrayObject):
+            return b'[' + b' '.join(self._serialize(item) for item in obj) + b']'
+        buffer = io.BytesIO()
+        obj.write_to_stream(buffer, None)
+        return buffer.getvalue()
+
+    def close(self):
+        """
+        写入页面树、目录和交叉引用表
+        """
+        if self._file is None:
+            return
+        try:
+            kids = ' '.join(f'{num} 0 R' for num in self._kids)
+            self._write_object(_PAGES_NUM, f'<</Type /Pages /Kids [{kids}] /Count {len(self._kids)}>>'.encode('ascii'))
+            self._write_object(_CATALOG_NUM, f'<</Type /Catalog /Pages {_PAGES_NUM} 0 R>>'.encode('ascii'))
+
+            xref_offset = self._file.tell()
+            lines = [f'xref\n0 {len(self._offsets)}\n', '0000000000 65535 f \n']
+            for offset in self._offsets[1:]:
+                if offset is None:
+                    lines.append('0000000000 65535 f \n')
+                else:
+                    lines.append(f'{offset:010d} 00000 n \n')
+            self._file.write(''.join(lines).encode('ascii'))
+            self._file.write(
+                f'trailer\n<</Size {len(self._offsets)} /Root {_CATALOG_NUM} 0 R>>\n'
+                f'startxref\n{xref_offset}\n%%EOF\n'.encode('ascii'))
+        finally:
+            self._file.close()
+            self._file = None
+
+    def abort(self):
+        """
+        放弃合并：关闭文件但不写入交叉引用表，留下的不完整输出由调用方删除
+        """
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.abort()
+        else:
+            self.close()
+        return False
+
+
+def merge_pdfs(source_paths: List[str], output_path: str) -> StreamingPdfMerger:
+    """
+    依次合并多个PDF到 output_path，返回合并器（含页数和去重统计）
+    """
+    with StreamingPdfMerger(output_path) as merger:
+        for source_path in source_paths:
+            merger.append(source_path)
+    return merger
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+现代文件转换器 - PDF 文本提取后端模块
+
+Copyright 2024 现代文件转换器项目
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import importlib.util
+import io
+import os
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Tuple
+
+
+# 环境变量：指定默认的文本提取后端
+PDF_EXTRACTOR_ENV = 'FTR_PDF_EXTRACTOR'
+
+# 默认后端（requirements.txt 中唯一必装的PDF库）
+DEFAULT_EXTRACTOR = 'pypdf2'
+
+
+class PdfTextExtractor(ABC):
+    """
+    文本提取后端基类
+
+    每个实例对应一个打开的PDF。needs_stream 为 True 的后端从文件对象（可能是内存映射）读取，
+    否则直接按路径打开（由底层C库自行管理文件读取）。
+    """
+
+    name = ''
+    module = ''
+    needs_stream = True
+
+    def __init__(self, source):
+        self.page_count = 0
+
+    @classmethod
+    def is_available(cls) -> bool:
+        return importlib.util.find_spec(cls.module) is not None
+
+    @abstractmethod
+    def extract(self, page_index: int) -> str:
+        """
+        返回第 page_index 页（从 0 开始）的文本
+        """
+
+    def close(self):
+        pass
+
+
+class PyPDF2Extractor(PdfTextExtractor):
+    name = 'pypdf2'
+    module = 'PyPDF2'
+
+    def __init__(self, source):
+        import PyPDF2
+        self._reader = PyPDF2.PdfReader(source)
+        self.page_count = len(self._reader.pages)
+
+    def extract(self, page_index: int) -> str:
+        return self._reader.pages[page_index].extract_text()
+
+
+class PypdfExtractor(PdfTextExtractor):
+    name = 'pypdf'
+    module = 'pypdf'
+
+    def __init__(self, source):
+        import pypdf
+        self._reader = pypdf.PdfReader(source)
+        self.page_count = len(self._reader.pages)
+
+    def extract(self, page_index: int) -> str:
+        return self._reader.pages[page_index].extract_text()
+
+
+class PdfminerExtractor(PdfTextExtractor):
+    name = 'pdfminer'
+    module = 'pdfminer'
+
+    def __init__(self, source):
+        from pdfminer.layout import LAParams
+        from pdfminer.pdfdocument import PDFDocument
+        from pdfminer.pdfinterp import PDFResourceManager
+        from pdfminer.pdfpage import PDFPage
+        from pdfminer.pdfparser import PDFParser
+
+        self._pages = list(PDFPage.create_pages(PDFDocument(PDFParser(source))))
+        self._resources = PDFResourceManager(caching=True)
+        self._laparams = LAParams()
+        self.page_count = len(self._pages)
+
+    def extract(self, page_index: int) -> str:
+        from pdfminer.converter import TextConverter
+        from pdfminer.pdfinterp import PDFPageInterpreter
+
+        output = io.StringIO()
+        device = TextConverter(self._resources, output, laparams=self._laparams)
+        try:
+            PDFPageInterpreter(self._resources, device).process_page(self._pages[page_index])
+        finally:
+            device.close()
+        return output.getvalue()
+
+
+class PyMuPDFExtractor(PdfTextExtractor):
+    name = 'pymupdf'
+    module = 'fitz'
+    needs_stream = False
+
+    def __init__(self, source):
+        try:
+            import pymupdf
+        except ImportError:
+            import fitz as pymupdf
+        self._document = pymupdf.open(source)
+        self.page_count = self._document.page_count
+
+    def extract(self, page_index: int) -> str:
+        return self._document[page_index].get_text()
+
+    def close(self):
+        self._document.close()
+
+
+class PdfiumExtractor(PdfTextExtractor):
+    name = 'pdfium'
+    module = 'pypdfium2'
+    needs_stream = False
+
+    def __init__(self, source):
+        import pypdfium2
+        self._document = pypdfium2.PdfDocument(source)
+        self.page_count = len(self._document)
+
+    def extract(self, page_index: int) -> str:
+        page = self._document[page_index]
+        try:
+            text_page = page.get_textpage()
+            try:
+                return text_page.get_text_range().replace('\r\n', '\n')
+            finally:
+                text_page.close()
+        finally:
+            page.close()
+
+    def close(self):
+        self._document.close()
+
+
+EXTRACTORS: Dict[str, type] = {
+    cls.name: cls for cls in (PyPDF2Extractor, PypdfExtractor, PdfminerExtractor,
+                              PyMuPDFExtractor, PdfiumExtractor)
+}
+
+
+def available_extractors() -> List[str]:
+    """
+    返回已安装的后端名称
+    """
+    return [name for name, cls in EXTRACTORS.items() if cls.is_available()]
+
+
+def get_extractor(name: Optional[str] = None) -> type:
+    """
+    按名称返回后端类；未指定时依次使用环境变量和默认后端
+    """
+    name = (name or os.environ.get(PDF_EXTRACTOR_ENV) or DEFAULT_EXTRACTOR).lower()
+    if name not in EXTRACTORS:
+        raise ValueError(f"未知的文本提取后端: {name}（可选: {', '.join(EXTRACTORS)}）")
+    cls = EXTRACTORS[name]
+    if not cls.is_available():
+        raise ValueError(f"文本提取后端未安装: {name}（需要 {cls.module}）")
+    return cls
+
+
+def benchmark_extractors(sample_paths: List[str], max_pages: int = 20,
+                         names: Optional[List[str]] = None) -> List[Tuple[str, float, Optional[str]]]:
+    """
+    在样本PDF上测量各后端的提取速度
+
+    每个样本最多提取 max_pages 页（均匀抽取）。返回按耗时升序排列的
+    (后端名, 每页平均毫秒, 错误信息)，出错的后端排在最后。
+    """
+    results = []
+    for name in names or available_extractors():
+        cls = EXTRACTORS[name]
+        pages = 0
+        elapsed = 0.0
+        error = None
+        try:
+            for source_path in sample_paths:
+                with open(source_path, 'rb') as file:
+                    start = time.perf_counter()
+                    extractor = cls(file) if cls.needs_stream else cls(source_path)
+                    try:
+                        count = extractor.page_count
+                        step = max(1, count // max_pages)
+                        for page_index in range(0, count, step)[:max_pages]:
+                            extractor.extract(page_index)
+                            pages += 1
+                    finally:
+                        extractor.close()
+                    elapsed += time.perf_counter() - start
+        except Exception as e:
+            error = str(e)
+        per_page = elapsed / pages * 1000 if pages and error is None else float('inf')
+        results.append((name, per_page, error))
+    results.sort(key=lambda item: item[1])
+    return results
+
+
+def select_fastest_extractor(sample_paths: List[str], max_pages: int = 20) -> str:
+    """
+    返回样本上最快且未出错的后端名，全部失败时返回默认后端
+    """
+    for name, _, error in benchmark_extractors(sample_paths, max_pages):
+        if error is None:
+            return name
+    return DEFAULT_EXTRACTOR
@@ -0,0 +1,423 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+现代文件转换器 - 本地HTTP转换服务模块
+
+Copyright 2024 现代文件转换器项目
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+接口:
+    POST /convert?format=PDF&path=源文件&output=输出文件
+        转换本机文件，返回 JSON 结果；输出只能写在服务的输出目录（--output-root）之内，
+        output 为相对路径时相对于该目录，省略时为 输出目录/源文件名.目标扩展名
+    POST /convert?format=PDF&filename=源文件名        (请求体为文件内容)
+        转换上传的文件，成功时直接返回转换后的文件
+    两种方式都可附加 wall_time=秒、cpu_time=秒、memory_limit=MB 覆盖服务默认的任务限制，
+    超出限制时返回 422，结果中 status 为 timeout 或 oom
+    GET /status
+        队列深度、处理中的任务数、延迟统计
+    Host 不是本机地址（或 --allow-host 指定的名称）、或带有其他来源的 Origin 的请求返回 403，
+    防止网页通过浏览器或 DNS 重绑定调用本地服务
+"""
+
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import time
+from collections import deque
+from typing import Iterable, Optional
+from urllib.parse import parse_qs, quote, urlsplit
+
+from file_converter import ConversionResult
+from worker_pool import (DEFAULT_MAX_JOBS_PER_WORKER, DEFAULT_MAX_WORKER_RSS_MB, JobLimits,
+                         WarmWorkerPool, run_conversion)
+
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+# 等待执行的任务上限，队列满时返回 429
+DEFAULT_QUEUE_SIZE = 64
+
+# 上传文件大小上限（MB）
+DEFAULT_MAX_UPLOAD_MB = 512
+
+# 同时接收请求体的上传数上限，超出时返回 429
+DEFAULT_MAX_UPLOADS = 4
+
+# 始终允许的 Host / Origin 主机名
+_LOOPBACK_HOSTS = ('localhost', '127.0.0.1', '::1')
+
+# 监听所有地址时无法从监听地址得知主机名
+_WILDCARD_HOSTS = ('', '0.0.0.0', '::')
+
+# 参与延迟统计的最近任务数
+_LATENCY_WINDOW = 1000
+
+_STATUS_TEXT = {
+    200: 'OK', 400: 'Bad Request', 403: 'Forbidden', 404: 'Not Found', 405: 'Method Not Allowed',
+    411: 'Length Required', 413: 'Payload Too Large', 422: 'Unprocessable Entity',
+    429: 'Too Many Requests', 500: 'Internal Server Error',
+}
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class ConversionServer:
+    """
+    基于 asyncio 的本地转换服务
+
+    请求先进入有界队列，由与工作进程数相同的调度协程取出并交给预热的工作进程池执行；
+    队列已满时立即返回 429，而不是无限堆积。上传请求在读取请求体之前就预留队列位置，
+    队列已满或同时上传过多时直接拒绝，不会先把文件写到磁盘。
+    """
+
+    def __init__(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, workers: Optional[int] = None,
+                 queue_size: int = DEFAULT_QUEUE_SIZE, max_upload_mb: int = DEFAULT_MAX_UPLOAD_MB,
+                 max_jobs_per_worker: int = DEFAULT_MAX_JOBS_PER_WORKER,
+                 max_worker_rss_mb: Optional[float] = DEFAULT_MAX_WORKER_RSS_MB,
+                 job_limits: Optional[JobLimits] = None, executor=None,
+                 max_uploads: int = DEFAULT_MAX_UPLOADS, output_root: Optional[str] = None,
+                 allowed_hosts: Iterable[str] = ()):
+        self.host = host
+        self.port = port
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = queue_size
+        self.max_upload_bytes = max_upload_mb * 1024 * 1024
+        self.max_uploads = max_uploads
+        # 本机文件转换的输出目录，默认为当前目录
+        self.output_root = os.path.realpath(output_root or os.getcwd())
+        self.allowed_hosts = {name.lower() for name in _LOOPBACK_HOSTS + tuple(allowed_hosts)}
+        if host not in _WILDCARD_HOSTS:
+            self.allowed_hosts.add(host.lower())
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.max_worker_rss_mb = max_worker_rss_mb
+        self.job_limits = job_limits or JobLimits()
+        self._executor = executor
+        self._queue: Optional[asyncio.Queue] = None
+        self._reserved = 0
+        self._uploading = 0
+        self._in_flight = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._timeouts = 0
+        self._oom = 0
+        self._latencies = deque(maxlen=_LATENCY_WINDOW)
+        self._started = time.time()
+
+    def status(self) -> dict:
+        """
+        服务的实时状态
+        """
+        latencies = sorted(self._latencies)
+
+        def percentile(p):
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))], 1)
+
+        status = {
+            'queue_depth': self._queue.qsize() if self._queue else 0,
+            'queue_size': self.queue_size,
+            'uploading': self._uploading,
+            'in_flight': self._in_flight,
+            'workers': self.workers,
+            'completed': self._completed,
+            'failed': self._failed,
+            'rejected': self._rejected,
+            'timeouts': self._timeouts,
+            'oom': self._oom,
+            'uptime_s': round(time.time() - self._started, 1),
+            'latency_ms': {
+                'count': len(latencies),
+                'avg': round(sum(latencies) / len(latencies), 1) if latencies else None,
+                'p50': percentile(0.5),
+                'p95': percentile(0.95),
+                'max': round(latencies[-1], 1) if latencies else None,
+            },
+        }
+        if isinstance(self._executor, WarmWorkerPool):
+            status['pool'] = self._executor.stats()
+        return status
+
+    async def serve_forever(self):
+        if self._executor is None:
+            self._executor = WarmWorkerPool(self.workers, self.max_jobs_per_worker, self.max_worker_rss_mb)
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        dispatchers = [asyncio.create_task(self._dispatch()) for _ in range(self.workers)]
+        server = await asyncio.start_server(self._handle_client, self.host, self.port)
+        print(f"转换服务已启动: http://{self.host}:{self.port} (工作进程 {self.workers}, 队列 {self.queue_size}, "
+              f"输出目录 {self.output_root})")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            for task in dispatchers:
+                task.cancel()
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            args, future = await self._queue.get()
+            self._in_flight += 1
+            try:
+                if isinstance(self._executor, WarmWorkerPool):
+                    # 超出限制的任务由进程池终止工作进程，结果的 status 为 timeout 或 oom
+                    result = await asyncio.wrap_future(self._executor.submit_conversion(*args))
+                else:
+                    result = await loop.run_in_executor(self._executor, run_conversion, *args[:4])
+                if not future.done():
+                    future.set_result(result)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            finally:
+                self._in_flight -= 1
+                self._queue.task_done()
+
+    def _reserve(self, upload: bool = False) -> dict:
+        """
+        预留一个队列位置，队列已满（含已预留的位置）或同时上传过多时抛出 429
+        """
+        if self._queue.qsize() + self._reserved >= self.queue_size:
+            self._rejected += 1
+            raise HttpError(429, '队列已满，请稍后重试')
+        if upload and self._uploading >= self.max_uploads:
+            self._rejected += 1
+            raise HttpError(429, '同时上传的文件过多，请稍后重试')
+        self._reserved += 1
+        if upload:
+            self._uploading += 1
+        return {'reserved': True, 'upload': upload}
+
+    def _release(self, slot: dict, upload_only: bool = False):
+        """
+        归还预留的位置；upload_only 为 True 时只结束上传计数（请求体已读完）
+        """
+        if slot['upload']:
+            slot['upload'] = False
+            self._uploading -= 1
+        if not upload_only and slot['reserved']:
+            slot['reserved'] = False
+            self._reserved -= 1
+
+    async def _submit(self, slot: dict, source_path: str, output_path: str, target_format: str,
+                      options: dict, limits: JobLimits) -> ConversionResult:
+        """
+        用预留的位置把任务放入队列并等待结果
+        """
+        future = asyncio.get_running_loop().create_future()
+        # 预留的位置计入了容量，这里一定有空位
+        self._queue.put_nowait(((source_path, output_path, target_format, options, limits), future))
+        self._release(slot)
+        start = time.perf_counter()
+        try:
+            result = await future
+        except Exception as e:
+            self._failed += 1
+            raise HttpError(500, f'工作进程错误: {e}')
+        self._latencies.append((time.perf_counter() - start) * 1000)
+        if result:
+            self._completed += 1
+        else:
+            self._failed += 1
+            if result.status == 'timeout':
+                self._timeouts += 1
+            elif result.status == 'oom':
+                self._oom += 1
+        return result
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            try:
+                method, target, headers = await self._read_head(reader)
+                self._check_origin(headers)
+                url = urlsplit(target)
+                query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+                if url.path == '/status':
+                    if method != 'GET':
+                        raise HttpError(405, '仅支持 GET')
+                    await self._send_json(writer, 200, self.status())
+                elif url.path == '/convert':
+                    if method != 'POST':
+                        raise HttpError(405, '仅支持 POST')
+                    await self._handle_convert(reader, writer, headers, query)
+                else:
+                    raise HttpError(404, f'未知路径: {url.path}')
+            except HttpError as e:
+                await self._send_json(writer, e.status, {'success': False, 'error': str(e)})
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError) as e:
+                await self._send_json(writer, 400, {'success': False, 'error': f'请求格式错误: {e}'})
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def _check_origin(self, headers: dict):
+        """
+        拒绝 Host 不在允许列表中、或 Origin 来自其他站点的请求
+        """
+        host = headers.get('host')
+        if host is not None and urlsplit(f'//{host}').hostname not in self.allowed_hosts:
+            raise HttpError(403, f'不允许的 Host: {host}')
+        origin = headers.get('origin')
+        if origin is not None and urlsplit(origin).hostname not in self.allowed_hosts:
+            raise HttpError(403, f'不允许的 Origin: {origin}')
+
+    def _resolve_output(self, output: Optional[str], source_path: str, target_format: str) -> str:
+        """
+        本机文件转换的输出路径，必须位于输出目录之内（解析符号链接和 .. 之后）
+        """
+        if not output:
+            stem = os.path.splitext(os.path.basename(source_path))[0]
+            output = f'{stem}.{target_format.lower()}'
+        output_path = os.path.realpath(os.path.join(self.output_root, output))
+        if os.path.commonpath([self.output_root, output_path]) != self.output_root \
+                or output_path == self.output_root:
+            raise HttpError(403, f'输出路径不在输出目录内: {output}')
+        return output_path
+
+    @staticmethod
+    async def _read_head(reader: asyncio.StreamReader):
+        head = await reader.readuntil(b'\r\n\r\n')
+        lines = head.decode('latin-1').split('\r\n')
+        method, target, _ = lines[0].split(' ', 2)
+        headers = {}
+        for line in lines[1:]:
+            if ':' in line:
+                name, value = line.split(':', 1)
+                headers[name.strip().lower()] = value.strip()
+        return method.upper(), target, headers
+
+    async def _handle_convert(self, reader, writer, headers: dict, query: dict):
+        target_format = query.get('format')
+        if not target_format:
+            raise HttpError(400, '缺少参数 format')
+        options = {
+            'no_compress': query.get('no_compress', '').lower() in ('1', 'true', 'yes'),
+            'memory_budget': int(query['memory_budget']) if 'memory_budget' in query else None,
+            'image_dpi': int(query['image_dpi']) if 'image_dpi' in query else None,
+            'jpeg_quality': int(query['jpeg_quality']) if 'jpeg_quality' in query else None,
+        }
+        limits = JobLimits(
+            wall_time=float(query['wall_time']) if 'wall_time' in query else self.job_limits.wall_time,
+            cpu_time=float(query['cpu_time']) if 'cpu_time' in query else self.job_limits.cpu_time,
+            memory_mb=int(query['memory_limit']) if 'memory_limit' in query else self.job_limits.memory_mb,
+        )
+
+        if 'path' in query:
+            # 本机文件：直接在原路径上转换
+            source_path = query['path']
+            if not os.path.isfile(source_path):
+                raise HttpError(404, f'源文件不存在: {source_path}')
+            output_path = self._resolve_output(query.get('output'), source_path, target_format)
+            slot = self._reserve()
+            try:
+                result = await self._submit(slot, source_path, output_path, target_format, options, limits)
+            finally:
+                self._release(slot)
+            await self._send_json(writer, 200 if result else 422, {
+                'success': result.success,
+                'status': result.status,
+                'output_path': result.output_path,
+                'output_size': result.output_size,
+            })
+            return
+
+        # 上传文件：请求体写入临时目录，转换结果直接作为响应体返回
+        filename = os.path.basename(query.get('filename', ''))
+        if not os.path.splitext(filename)[1]:
+            raise HttpError(400, '上传文件需要带扩展名的 filename 参数')
+        if 'content-length' not in headers:
+            raise HttpError(411, '上传文件需要 Content-Length')
+        try:
+            length = int(headers['content-length'])
+        except ValueError:
+            raise HttpError(400, f"Content-Length 无效: {headers['content-length']}")
+        if length < 0:
+            raise HttpError(400, f'Content-Length 无效: {length}')
+        if length > self.max_upload_bytes:
+            raise HttpError(413, f'上传文件超过 {self.max_upload_bytes // (1024 * 1024)} MB')
+
+        # 先预留队列位置再读取请求体，队列已满时不接收文件
+        slot = self._reserve(upload=True)
+        work_dir = tempfile.mkdtemp(prefix='ftr-serve-')
+        try:
+            source_path = os.path.join(work_dir, filename)
+            with open(source_path, 'wb') as file:
+                remaining = length
+                while remaining:
+                    chunk = await reader.read(min(remaining, 1024 * 1024))
+                    if not chunk:
+                        raise HttpError(400, '请求体不完整')
+                    file.write(chunk)
+                    remaining -= len(chunk)
+            self._release(slot, upload_only=True)
+            output_name = f'{os.path.splitext(filename)[0]}.{target_format.lower()}'
+            output_path = os.path.join(work_dir, 'output', output_name)
+            result = await self._submit(slot, source_path, output_path, target_format, options, limits)
+            if not result:
+                raise HttpError(422, f'转换失败 ({result.status})')
+            await self._send_file(writer, output_path, output_name)
+        finally:
+            self._release(slot)
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    @staticmethod
+    def _head(status: int, content_type: str, length: int, extra: str = '') -> bytes:
+        return (f'HTTP/1.1 {status} {_STATUS_TEXT.get(status, "")}\r\n'
+                f'Content-Type: {content_type}\r\nContent-Length: {length}\r\n'
+                f'{extra}Connection: close\r\n\r\n').encode('latin-1')
+
+    async def _send_json(self, writer: asyncio.StreamWriter, status: int, payload: dict):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        writer.write(self._head(status, 'application/json; charset=utf-8', len(body)))
+        writer.write(body)
+        await writer.drain()
+
+    async def _send_file(self, writer: asyncio.StreamWriter, path: str, filename: str):
+        size = os.path.getsize(path)
+        disposition = f"Content-Disposition: attachment; filename*=UTF-8''{quote(filename)}\r\n"
+        writer.write(self._head(200, 'application/octet-stream', size, disposition))
+        with open(path, 'rb') as file:
+            for chunk in iter(lambda: file.read(1024 * 1024), b''):
+                writer.write(chunk)
+                await writer.drain()
+
+
+def serve(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, workers: Optional[int] = None,
+          queue_size: int = DEFAULT_QUEUE_SIZE, max_upload_mb: int = DEFAULT_MAX_UPLOAD_MB,
+          max_jobs_per_worker: int = DEFAULT_MAX_JOBS_PER_WORKER,
+          max_worker_rss_mb: Optional[float] = DEFAULT_MAX_WORKER_RSS_MB,
+          job_limits: Optional[JobLimits] = None, max_uploads: int = DEFAULT_MAX_UPLOADS,
+          output_root: Optional[str] = None, allowed_hosts: Iterable[str] = ()):
+    """
+    启动转换服务并一直运行，直到被中断
+    """
+    server = ConversionServer(host, port, workers, queue_size, max_upload_mb,
+                              max_jobs_per_worker, max_worker_rss_mb, job_limits,
+                              max_uploads=max_uploads, output_root=output_root,
+                              allowed_hosts=allowed_hosts)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        print("转换服务已停止")
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""
+PDF 分页检查点的回归测试
+"""
+
+import os
+import sys
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pdf_text
+from file_converter import FileConverter
+from pdf_checkpoint import CHECKPOINT_PAGES, PageCheckpoint, checkpoint_path_for
+
+# PDF 提取的文本中出现的单独代理项（数学字母符号的前半部分）
+LONE_SURROGATE = '\ud835'
+
+
+class SurrogateExtractor(pdf_text.PdfTextExtractor):
+    name = 'surrogate-test'
+    module = 'os'
+    needs_stream = False
+
+    def __init__(self, source):
+        self.page_count = 400
+
+    def extract(self, page_index: int) -> str:
+        return f'第{page_index}页 {LONE_SURROGATE}x'
+
+
+def test_checkpoint_round_trips_lone_surrogates(tmp_path):
+    source = tmp_path / 'source.pdf'
+    source.write_bytes(b'%PDF-1.4\n')
+    path = str(tmp_path / 'out.md.ckpt')
+    pages = [f'page {index} {LONE_SURROGATE}' for index in range(CHECKPOINT_PAGES)]
+
+    with PageCheckpoint(path, str(source), 'pypdf2', 400) as checkpoint:
+        assert checkpoint.load() == []
+        for index, text in enumerate(pages):
+            checkpoint.add(index, text)
+
+    with PageCheckpoint(path, str(source), 'pypdf2', 400) as checkpoint:
+        assert checkpoint.load() == pages
+
+
+def test_long_pdf_to_docx_with_lone_surrogates(tmp_path, monkeypatch):
+    monkeypatch.setitem(pdf_text.EXTRACTORS, SurrogateExtractor.name, SurrogateExtractor)
+    source = tmp_path / 'long.pdf'
+    source.write_bytes(b'%PDF-1.4\n')
+    output = str(tmp_path / 'long.docx')
+
+    converter = FileConverter(text_cache=False, text_extractor=SurrogateExtractor.name)
+    assert converter._pdf_to_docx(str(source), output, checkpoint_path=checkpoint_path_for(output))
+    with zipfile.ZipFile(output) as package:
+        assert '第399页 x' in package.read('word/document.xml').decode('utf-8')
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+现代文件转换器 - PDF 提取文本缓存模块
+
+Copyright 2024 现代文件转换器项目
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Optional
+
+
+# 环境变量：缓存数据库路径和容量上限（MB）
+TEXT_CACHE_ENV = 'FTR_TEXT_CACHE'
+TEXT_CACHE_SIZE_ENV = 'FTR_TEXT_CACHE_MB'
+
+# 默认容量上限（按压缩后的大小计）
+DEFAULT_TEXT_CACHE_BYTES = 256 * 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    file_key TEXT PRIMARY KEY,
+    page_count INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS pages (
+    file_key TEXT NOT NULL,
+    page INTEGER NOT NULL,
+    data BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (file_key, page)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS pages_last_used ON pages (last_used);
+CREATE TABLE IF NOT EXISTS sources (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    digest TEXT NOT NULL
+);
+"""
+
+_default_cache: Optional['TextCache'] = None
+_default_lock = threading.Lock()
+
+
+def default_cache_path() -> str:
+    """
+    缓存数据库的默认位置：环境变量 > 用户缓存目录
+    """
+    path = os.environ.get(TEXT_CACHE_ENV)
+    if path:
+        return path
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'ftr-converter', 'text_cache.sqlite3')
+
+
+def file_digest(source_path: str) -> str:
+    """
+    按文件内容计算缓存键（与路径和修改时间无关）
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(source_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(4 * 1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class TextCache:
+    """
+    按页缓存PDF提取文本
+
+    以 (文件内容哈希, 页码) 为键，文本经 zlib 压缩后存入 SQLite 单文件数据库；
+    总大小超过上限时按最近使用时间淘汰 (LRU)。多个进程可同时使用同一数据库：
+    命中只做读取；新提取的页面和最近使用时间先留在内存中，到 commit/flush 时
+    在一个短事务中写入，提取页面期间不持有写锁。
+    缓存出错时只打印错误并当作未命中处理，不影响转换。
+    """
+
+    def __init__(self, path: Optional[str] = None, max_bytes: int = DEFAULT_TEXT_CACHE_BYTES):
+        self.path = path or default_cache_path()
+        self.max_bytes = max_bytes
+        # sqlite3 连接不能跨线程使用，每个线程各自打开
+        self._local = threading.local()
+
+    def __getstate__(self):
+        # 连接不随对象传入其他进程，在目标进程中重新打开
+        return {'path': self.path, 'max_bytes': self.max_bytes}
+
+    def __setstate__(self, state):
+        self.__init__(state['path'], state['max_bytes'])
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            cache_dir = os.path.dirname(self.path)
+            if cache_dir:
+                os.makedirs(cache_dir, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+            self._local.touched = []
+            self._local.pending = {}
+        return conn
+
+    def source_digest(self, source_path: str) -> str:
+        """
+        源文件的内容哈希：路径、大小和修改时间与上次记录相同时直接返回记录的哈希，
+        否则读取整个文件计算并记录（重复转换同一文件时不必每次重新读取全文）
+        """
+        stat = os.stat(source_path)
+        path = os.path.realpath(source_path)
+        try:
+            row = self._connection().execute(
+                'SELECT digest FROM sources WHERE path = ? AND size = ? AND mtime_ns = ?',
+                (path, stat.st_size, stat.st_mtime_ns)).fetchone()
+            if row:
+                return row[0]
+        except sqlite3.Error as e:
+            print(f"文本缓存错误: {e}")
+        digest = file_digest(source_path)
+        try:
+            with self._connection() as conn:
+                conn.execute('INSERT OR REPLACE INTO sources (path, size, mtime_ns, digest) VALUES (?, ?, ?, ?)',
+                             (path, stat.st_size, stat.st_mtime_ns, digest))
+        except sqlite3.Error as e:
+            print(f"文本缓存错误: {e}")
+        return digest
+
+    def get_page_count(self, file_key: str) -> Optional[int]:
+        try:
+            row = self._connection().execute(
+                'SELECT page_count FROM documents WHERE file_key = ?', (file_key,)).fetchone()
+            return row[0] if row else None
+        except sqlite3.Error as e:
+            print(f"文本缓存错误: {e}")
+            return None
+
+    def put_page_count(self, file_key: str, page_count: int):
+        try:
+            with self._connection() as conn:
+                conn.execute('INSERT OR REPLACE INTO documents (file_key, page_count) VALUES (?, ?)',
+                             (file_key, page_count))
+        except sqlite3.Error as e:
+            print(f"文本缓存错误: {e}")
+
+    def get(self, file_key: str, page_index: int) -> Optional[str]:
+        """
+        返回缓存的页面文本，未命中时返回 None
+        """
+        try:
+            conn = self._connection()
+            pending = self._local.pending.get((file_key, page_index))
+            if pending is not None:
+                return zlib.decompress(pending[0]).decode('utf-8', 'surrogatepass')
+            row = conn.execute('SELECT data FROM pages WHERE file_key = ? AND page = ?',
+                               (file_key, page_index)).fetchone()
+            if row is None:
+                return None
+            self._local.touched.append((time.time(), file_key, page_index))
+            return zlib.decompress(row[0]).decode('utf-8', 'surrogatepass')
+        except (sqlite3.Error, zlib.error) as e:
+            print(f"文本缓存错误: {e}")
+            return None
+
+    def put(self, file_key: str, page_index: int, text: str):
+        """
+        记录一页的提取文本，到下次 commit/flush 时写入数据库
+        """
+        try:
+            data = zlib.compress(text.encode('utf-8', 'surrogatepass'), 6)
+            # 打开本线程的连接，同时初始化本线程的缓冲
+            self._connection()
+            self._local.pending[(file_key, page_index)] = (data, time.time())
+        except sqlite3.Error as e:
+            print(f"文本缓存错误: {e}")
+
+    def _write_buffered(self, conn: sqlite3.Connection):
+        pending, touched = self._local.pending, self._local.touched
+        self._local.pending, self._local.touched = {}, []
+        if pending:
+            conn.executemany(
+                'INSERT OR REPLACE INTO pages (file_key, page, data, size, last_used) VALUES (?, ?, ?, ?, ?)',
+                [(file_key, page, data, len(data), used) for (file_key, page), (data, used) in pending.items()])
+        if touched:
+            conn.executemany('UPDATE pages SET last_used = ? WHERE file_key = ? AND page = ?', touched)
+
+    def commit(self):
+        """
+        在一个短事务中写入内存中的页面和最近使用时间（中途提交可让中断后的重跑复用已提取的页面）
+        """
+        try:
+            with self._connection() as conn:
+                self._write_buffered(conn)
+        except sqlite3.Error as e:
+            print(f"文本缓存错误: {e}")
+
+    def flush(self):
+        """
+        提交并在超出容量时淘汰最久未使用的页面
+        """
+        try:
+            conn = self._connection()
+            with conn:
+                self._write_buffered(conn)
+            total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM pages').fetchone()[0]
+            excess = total - self.max_bytes
+            if excess <= 0:
+                return
+            victims = []
+            for file_key, page, size in conn.execute('SELECT file_key, page, size FROM pages ORDER BY last_used'):
+                victims.append((file_key, page))
+                excess -= size
+                if excess <= 0:
+                    break
+            with conn:
+                conn.executemany('DELETE FROM pages WHERE file_key = ? AND page = ?', victims)
+                conn.execute('DELETE FROM documents WHERE file_key NOT IN (SELECT DISTINCT file_key FROM pages)')
+                conn.execute("DELETE FROM sources WHERE NOT EXISTS "
+                             "(SELECT 1 FROM documents WHERE documents.file_key LIKE sources.digest || ':%')")
+        except sqlite3.Error as e:
+            print(f"文本缓存错误: {e}")
+
+
+def get_default_text_cache() -> TextCache:
+    """
+    返回进程共享的默认文本缓存
+    """
+    global _default_cache
+    if _default_cache is None:
+        with _default_lock:
+            if _default_cache is None:
+                size_mb = os.environ.get(TEXT_CACHE_SIZE_ENV, '')
+                max_bytes = int(size_mb) * 1024 * 1024 if size_mb.isdigit() else DEFAULT_TEXT_CACHE_BYTES
+                _default_cache = TextCache(max_bytes=max_bytes)
+    return _default_cache
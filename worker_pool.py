@@ -0,0 +1,509 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+现代文件转换器 - 预热工作进程池模块
+
+Copyright 2024 现代文件转换器项目
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import multiprocessing
+import os
+import queue
+import signal
+import sys
+import threading
+import time
+from concurrent.futures import Executor, Future
+from typing import List, Optional
+
+from atomic_output import remove_stale_partials
+
+
+# forkserver 进程预先导入的模块，之后的工作进程从它 fork 出来，无需重复导入
+DEFAULT_PRELOAD = [
+    'pandas',
+    'numpy',
+    'PIL.Image',
+    'PyPDF2',
+    'reportlab.platypus',
+    'lxml.etree',
+    'file_converter',
+]
+
+# 默认每个工作进程处理多少个任务后回收
+DEFAULT_MAX_JOBS_PER_WORKER = 200
+
+# 默认工作进程常驻内存超过该值（MB）后回收
+DEFAULT_MAX_WORKER_RSS_MB = 1024
+
+# 看门狗检查运行中任务的间隔（秒）
+WATCHDOG_INTERVAL = 0.2
+
+# 判断地址空间限制是否被触及时允许的余量
+_AS_LIMIT_SLACK = 64 * 1024 * 1024
+
+_SIGXCPU = getattr(signal, 'SIGXCPU', None)
+_SIGKILL = getattr(signal, 'SIGKILL', None)
+
+
+class WorkerCrashed(RuntimeError):
+    """
+    工作进程在执行任务期间意外退出
+    """
+
+
+class JobLimitExceeded(WorkerCrashed):
+    """
+    任务超出限制，工作进程已被终止并替换
+
+    status 为 'timeout'（墙钟或CPU时间）或 'oom'（内存）
+    """
+
+    def __init__(self, status: str, message: str):
+        super().__init__(message)
+        self.status = status
+
+    def __reduce__(self):
+        return type(self), (self.status, str(self))
+
+
+class JobLimits:
+    """
+    单个任务的资源限制
+
+    wall_time   墙钟时间（秒），由父进程的看门狗计时，超时即终止工作进程
+    cpu_time    CPU时间（秒），通过 RLIMIT_CPU 软限制，超出时内核发送 SIGXCPU
+    memory_mb   任务允许新增的内存（MB）：工作进程的地址空间限制 (RLIMIT_AS) 为任务开始时
+                的大小加上该值，分配失败时抛出 MemoryError；看门狗同时检查常驻内存的增长，
+                超出即终止工作进程。多线程解码会预留较多地址空间，取值应留有余量
+    资源限制只在 POSIX 系统上生效，常驻内存检查只在 Linux 上生效。
+    """
+
+    def __init__(self, wall_time: Optional[float] = None, cpu_time: Optional[float] = None,
+                 memory_mb: Optional[int] = None):
+        self.wall_time = wall_time
+        self.cpu_time = cpu_time
+        self.memory_mb = memory_mb
+
+    def __bool__(self):
+        return bool(self.wall_time or self.cpu_time or self.memory_mb)
+
+
+def _current_rss_mb() -> float:
+    """
+    当前进程的常驻内存（MB）；Linux 读取 /proc，其他平台退回峰值常驻内存
+    """
+    rss = _process_rss_mb(os.getpid())
+    if rss is not None:
+        return rss
+    try:
+        import resource
+    except ImportError:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _process_rss_mb(pid: int) -> Optional[float]:
+    """
+    指定进程的常驻内存（MB），无法读取时返回 None
+    """
+    try:
+        with open(f'/proc/{pid}/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _vm_bytes(field: str) -> Optional[int]:
+    """
+    读取 /proc/self/status 中的 VmSize / VmPeak（字节）
+    """
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def _apply_limits(limits: Optional[JobLimits]) -> list:
+    """
+    在工作进程中为当前任务设置 CPU 时间和地址空间的软限制
+
+    只修改软限制，任务结束后可以恢复。返回 [(资源, 原软限制, 硬限制, 新软限制), ...]
+    """
+    applied = []
+    if not limits:
+        return applied
+    try:
+        import resource
+    except ImportError:
+        return applied
+
+    def lower(kind, value):
+        soft, hard = resource.getrlimit(kind)
+        if hard != resource.RLIM_INFINITY:
+            value = min(value, hard)
+        resource.setrlimit(kind, (value, hard))
+        applied.append((kind, soft, hard, value))
+
+    if limits.cpu_time:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        lower(resource.RLIMIT_CPU, int(usage.ru_utime + usage.ru_stime + limits.cpu_time) + 1)
+    if limits.memory_mb and hasattr(resource, 'RLIMIT_AS'):
+        vm_size = _vm_bytes('VmSize')
+        if vm_size is not None:
+            lower(resource.RLIMIT_AS, vm_size + limits.memory_mb * 1024 * 1024)
+    return applied
+
+
+def _restore_limits(applied: list, peak_before: Optional[int]) -> bool:
+    """
+    恢复软限制，返回本任务是否触及了地址空间限制
+    """
+    if not applied:
+        return False
+    import resource
+    hit = False
+    for kind, soft, hard, value in applied:
+        if kind == getattr(resource, 'RLIMIT_AS', None):
+            peak = _vm_bytes('VmPeak')
+            hit = (peak is not None and peak != peak_before
+                   and peak >= value - _AS_LIMIT_SLACK)
+        resource.setrlimit(kind, (soft, hard))
+    return hit
+
+
+def _warm_up():
+    """
+    初始化进程级的渲染上下文和字体，首个任务不再承担这部分开销
+    """
+    try:
+        from file_converter import get_render_context
+        from font_manager import get_cjk_font
+        get_render_context()
+        get_cjk_font()
+    except Exception as e:
+        print(f"工作进程预热错误: {e}")
+
+
+def _worker_main(conn):
+    _warm_up()
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            break
+        if task is None:
+            break
+        fn, args, kwargs, limits = task
+        peak_before = _vm_bytes('VmPeak')
+        applied = _apply_limits(limits)
+        try:
+            reply = ('ok', fn(*args, **kwargs))
+        except Exception as e:
+            reply = ('error', e)
+        # 转换方法会在内部捕获 MemoryError 并返回失败结果，因此按地址空间峰值判断是否超限
+        oom = _restore_limits(applied, peak_before)
+        if oom and (reply[0] == 'error' or not reply[1]):
+            reply = ('error', JobLimitExceeded('oom', f"任务超过内存限制 {limits.memory_mb} MB"))
+        try:
+            conn.send((*reply, _current_rss_mb(), oom))
+        except Exception as e:
+            # 结果或异常无法序列化
+            conn.send(('error', RuntimeError(f"任务结果无法传回: {e}"), _current_rss_mb(), oom))
+
+
+# 工作进程中常驻的转换器（首个任务时创建，之后的任务复用）
+_worker_converter = None
+
+
+def run_conversion(source_path: str, output_path: str, target_format: str, options: Optional[dict] = None):
+    """
+    在工作进程中执行一次转换，进程内的 FileConverter 在首个任务时创建并复用
+
+    options 可包含 memory_budget、no_compress、image_dpi、jpeg_quality、fsync
+    """
+    global _worker_converter
+    from file_converter import FileConverter, PdfOptions
+    if _worker_converter is None:
+        _worker_converter = FileConverter()
+    options = options or {}
+    pdf_options = PdfOptions(compress=not options.get('no_compress', False),
+                             image_dpi=options.get('image_dpi'),
+                             jpeg_quality=options.get('jpeg_quality'))
+    return _worker_converter.convert(source_path, output_path, target_format,
+                                     memory_budget_mb=options.get('memory_budget'),
+                                     pdf_options=pdf_options, fsync=options.get('fsync'))
+
+
+class _Worker:
+    def __init__(self, process, conn):
+        self.process = process
+        self.conn = conn
+        self.jobs = 0
+
+
+class WarmWorkerPool(Executor):
+    """
+    预热的工作进程池
+
+    在 forkserver 进程中预先导入 pandas、reportlab、PIL、PyPDF2 等库，工作进程从中 fork，
+    启动时不再重复导入。工作进程处理 max_jobs_per_worker 个任务、或常驻内存超过
+    max_rss_mb 后被回收并按需重新创建，以控制内存泄漏。
+    任务可以带 JobLimits，超出限制的工作进程由看门狗终止并替换，不影响其他任务。
+    实现 concurrent.futures.Executor 接口，可直接用于 loop.run_in_executor。
+    不支持 forkserver 的平台（Windows）退回 spawn，工作进程各自导入。
+    """
+
+    def __init__(self, max_workers: Optional[int] = None,
+                 max_jobs_per_worker: int = DEFAULT_MAX_JOBS_PER_WORKER,
+                 max_rss_mb: Optional[float] = DEFAULT_MAX_WORKER_RSS_MB,
+                 preload: Optional[List[str]] = None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.max_rss_mb = max_rss_mb
+        if 'forkserver' in multiprocessing.get_all_start_methods():
+            self._context = multiprocessing.get_context('forkserver')
+            self._context.set_forkserver_preload(DEFAULT_PRELOAD if preload is None else preload)
+        else:
+            self._context = multiprocessing.get_context('spawn')
+        self._tasks = queue.Queue()
+        self._lock = threading.Lock()
+        self._shutdown = False
+        self._busy = 0
+        self._counters = {'spawned': 0, 'recycled_jobs': 0, 'recycled_rss': 0, 'crashed': 0,
+                          'killed_timeout': 0, 'killed_oom': 0, 'completed': 0, 'failed': 0}
+        self._threads = []
+        for index in range(self.max_workers):
+            thread = threading.Thread(target=self._run_slot, name=f'worker-pool-{index}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, fn, /, *args, **kwargs) -> Future:
+        return self.submit_limited(None, fn, *args, **kwargs)
+
+    def submit_limited(self, limits: Optional[JobLimits], fn, /, *args, **kwargs) -> Future:
+        """
+        提交带资源限制的任务；超出限制时 Future 抛出 JobLimitExceeded
+        """
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError('工作进程池已关闭')
+            future = Future()
+            self._tasks.put((future, fn, args, kwargs, limits or None))
+            return future
+
+    def submit_conversion(self, source_path: str, output_path: str, target_format: str,
+                          options: Optional[dict] = None, limits: Optional[JobLimits] = None) -> Future:
+        """
+        提交一次转换，Future 的结果总是 ConversionResult
+
+        超出限制或工作进程崩溃时删除遗留的临时输出，结果的 status 为 'timeout'、'oom' 或 'failed'
+        """
+        from file_converter import ConversionResult
+
+        result = Future()
+        inner = self.submit_limited(limits, run_conversion, source_path, output_path, target_format, options)
+
+        def done(inner_future):
+            if inner_future.cancelled():
+                result.cancel()
+                result.set_running_or_notify_cancel()
+                return
+            error = inner_future.exception()
+            if error is None:
+                result.set_result(inner_future.result())
+                return
+            print(f"转换错误: {source_path}: {error}")
+            # 被终止的工作进程来不及清理临时文件，输出本身不会被写坏
+            remove_stale_partials(output_path)
+            result.set_result(ConversionResult(False, output_path, getattr(error, 'status', 'failed')))
+
+        inner.add_done_callback(done)
+        return result
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False):
+        with self._lock:
+            if self._shutdown:
+                return
+            self._shutdown = True
+        if cancel_futures:
+            while True:
+                try:
+                    item = self._tasks.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not None:
+                    item[0].cancel()
+        for _ in self._threads:
+            self._tasks.put(None)
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+    def stats(self) -> dict:
+        """
+        进程池计数：已创建、按任务数/内存回收、崩溃、因超时/超内存终止、完成/失败的任务数
+        """
+        with self._lock:
+            stats = dict(self._counters)
+            stats['recycled'] = stats['recycled_jobs'] + stats['recycled_rss']
+            stats['workers'] = self.max_workers
+            stats['busy'] = self._busy
+            stats['pending'] = self._tasks.qsize()
+            return stats
+
+    def _count(self, name: str, delta: int = 1):
+        with self._lock:
+            self._counters[name] += delta
+
+    def _spawn(self) -> _Worker:
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        process.start()
+        child_conn.close()
+        self._count('spawned')
+        return _Worker(process, parent_conn)
+
+    @staticmethod
+    def _stop(worker: _Worker):
+        try:
+            worker.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        worker.process.join(timeout=5)
+        if worker.process.is_alive():
+            worker.process.kill()
+            worker.process.join()
+        worker.conn.close()
+
+    @staticmethod
+    def _kill(worker: _Worker):
+        worker.process.kill()
+        worker.process.join()
+        worker.conn.close()
+
+    def _wait_reply(self, worker: _Worker, limits: Optional[JobLimits]):
+        """
+        等待工作进程返回结果，同时由看门狗检查墙钟时间和常驻内存
+
+        超出限制时终止工作进程并抛出 JobLimitExceeded，工作进程退出时抛出 EOFError
+        """
+        if not limits:
+            return worker.conn.recv()
+        deadline = time.monotonic() + limits.wall_time if limits.wall_time else None
+        baseline_rss = _process_rss_mb(worker.process.pid) if limits.memory_mb else None
+        while not worker.conn.poll(WATCHDOG_INTERVAL):
+            if deadline is not None and time.monotonic() > deadline:
+                self._kill(worker)
+                raise JobLimitExceeded('timeout', f"任务超过墙钟时间限制 {limits.wall_time} 秒")
+            if baseline_rss is not None:
+                rss = _process_rss_mb(worker.process.pid)
+                if rss is not None and rss - baseline_rss > limits.memory_mb:
+                    self._kill(worker)
+                    raise JobLimitExceeded('oom', f"任务超过内存限制 {limits.memory_mb} MB")
+        return worker.conn.recv()
+
+    def _run_slot(self):
+        """
+        每个槽位对应一个工作进程，依次把任务发给它并等待结果
+        """
+        worker = None
+        while True:
+            item = self._tasks.get()
+            if item is None:
+                break
+            future, fn, args, kwargs, limits = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            if worker is None:
+                try:
+                    worker = self._spawn()
+                except Exception as e:
+                    self._count('failed')
+                    future.set_exception(e)
+                    continue
+            with self._lock:
+                self._busy += 1
+            try:
+                try:
+                    worker.conn.send((fn, args, kwargs, limits))
+                except (OSError, ValueError):
+                    raise EOFError
+                except Exception as e:
+                    # 任务无法序列化，工作进程不受影响
+                    self._count('failed')
+                    future.set_exception(e)
+                    continue
+                try:
+                    status, value, rss_mb, oom = self._wait_reply(worker, limits)
+                except (EOFError, OSError):
+                    raise EOFError
+            except JobLimitExceeded as e:
+                worker = None
+                self._count('killed_timeout' if e.status == 'timeout' else 'killed_oom')
+                self._count('failed')
+                future.set_exception(e)
+                continue
+            except EOFError:
+                self._stop(worker)
+                exitcode = worker.process.exitcode
+                worker = None
+                if limits and _SIGXCPU is not None and exitcode == -_SIGXCPU:
+                    # 超过 RLIMIT_CPU，被内核终止
+                    self._count('killed_timeout')
+                    error = JobLimitExceeded('timeout', f"任务超过CPU时间限制 {limits.cpu_time} 秒")
+                elif limits and limits.memory_mb and _SIGKILL is not None and exitcode == -_SIGKILL:
+                    # 设置了内存限制时，SIGKILL 通常来自系统的 OOM killer
+                    self._count('killed_oom')
+                    error = JobLimitExceeded('oom', "工作进程因内存不足被系统终止")
+                else:
+                    self._count('crashed')
+                    error = WorkerCrashed(f"工作进程意外退出 (exitcode={exitcode})")
+                self._count('failed')
+                future.set_exception(error)
+                continue
+            finally:
+                with self._lock:
+                    self._busy -= 1
+
+            worker.jobs += 1
+            if status == 'ok':
+                self._count('completed')
+                future.set_result(value)
+            else:
+                self._count('failed')
+                future.set_exception(value)
+
+            if oom:
+                # 地址空间耗尽后堆可能已碎片化，直接替换工作进程
+                self._stop(worker)
+                worker = None
+                self._count('killed_oom')
+            elif worker.jobs >= self.max_jobs_per_worker:
+                self._stop(worker)
+                worker = None
+                self._count('recycled_jobs')
+            elif self.max_rss_mb and rss_mb > self.max_rss_mb:
+                self._stop(worker)
+                worker = None
+                self._count('recycled_rss')
+
+        if worker is not None:
+            self._stop(worker)